@@ -0,0 +1,175 @@
+import copy
+import logging
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import DefaultDict, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, cast
+
+import hicdex.models as models
+from hicdex.metrics import Metrics
+from hicdex.utils import insert_unversioned, mark_clean
+
+_logger = logging.getLogger(__name__)
+
+HOLDER_CACHE_SIZE = 100_000
+
+
+class HolderCache:
+    """Process-wide LRU cache of `Holder` rows keyed by address.
+
+    Indexes run concurrently, so instances are never shared: `get` returns a copy owned by the caller. Copies
+    of rows read or inserted are stored with `put`, and fields written by an update are applied to the stored
+    copy with `update`; changes are never visible to other callers before they are written. Code updating
+    holders otherwise must `discard` them. The cache must be cleared on rollback.
+    """
+
+    def __init__(self, size: int = HOLDER_CACHE_SIZE) -> None:
+        self._size = size
+        self._holders: OrderedDict[str, models.Holder] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._holders)
+
+    def resize(self, size: int) -> None:
+        self._size = size
+        self._evict()
+
+    def get(self, address: str) -> Optional[models.Holder]:
+        holder = self._holders.get(address)
+        if holder is None:
+            Metrics.set_holder_cache_miss()
+            return None
+
+        Metrics.set_holder_cache_hit()
+        self._holders.move_to_end(address)
+        return _copy(holder)
+
+    def put(self, holder: models.Holder) -> None:
+        """Store a copy of the holder as it's stored in the database; it must be marked clean"""
+        self._holders[holder.address] = _copy(holder)
+        self._holders.move_to_end(holder.address)
+        self._evict()
+
+    def update(self, holder: models.Holder, fields: Iterable[str]) -> None:
+        """Apply fields written to the database to the cached copy; other fields could be changed by other callers
+        since the holder was read. Holders not cached anymore will be read again.
+        """
+        if (cached := self._holders.get(holder.address)) is None:
+            return
+        for field in fields:
+            setattr(cached, field, getattr(holder, field))
+        mark_clean(cached)
+
+    def discard(self, address: str) -> None:
+        self._holders.pop(address, None)
+
+    def clear(self) -> None:
+        _logger.info('Dropping %s cached holders', len(self._holders))
+        self._holders.clear()
+        Metrics.set_holder_cache_size(0)
+
+    async def get_or_create(self, address: str) -> Tuple[models.Holder, bool]:
+        """Drop-in replacement for `models.Holder.get_or_create(address=...)`"""
+        if (holder := self.get(address)) is not None:
+            return holder, False
+
+        holder, created = await models.Holder.get_or_create(address=address)
+        self.put(holder)
+        return holder, created
+
+    def _evict(self) -> None:
+        while len(self._holders) > self._size:
+            self._holders.popitem(last=False)
+        Metrics.set_holder_cache_size(len(self._holders))
+
+
+def _copy(holder: models.Holder) -> models.Holder:
+    copied = copy.copy(holder)
+    # NOTE: Replaced on write, but must not be shared anyway
+    copied._original_versioned_data = dict(holder._original_versioned_data)
+    return copied
+
+
+class TagCache:
+    """Process-wide dictionary of tag ids; loaded once, new tags are inserted in bulk"""
+
+    def __init__(self) -> None:
+        self._ids: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self._ids or {})
+
+    def clear(self) -> None:
+        self._ids = None
+
+    async def get_ids(self, tags: Iterable[str]) -> Dict[str, int]:
+        """Get ids of tags, creating missing ones"""
+        if self._ids is None:
+            self._ids = dict(cast(List[Tuple[str, int]], await models.TagModel.all().values_list('tag', 'id')))
+            _logger.info('Loaded %s tags', len(self._ids))
+
+        tags = set(tags)
+        if missing := tags.difference(self._ids):
+            # NOTE: Another job could have inserted some of them already
+            await insert_unversioned(models.TagModel, [models.TagModel(tag=tag) for tag in missing])
+            ids = await models.TagModel.filter(tag__in=missing).values_list('tag', 'id')
+            self._ids.update(cast(List[Tuple[str, int]], ids))
+        return {tag: self._ids[tag] for tag in tags}
+
+
+@dataclass(frozen=True)
+class SplitContractInfo:
+    id: int
+    address: str
+    signatures_required: int
+    core_participants: FrozenSet[str]
+
+
+class SplitContractRegistry:
+    """Process-wide registry of split contracts and their core participants keyed by contract address.
+
+    Loaded once, new contracts are registered on origination. The registry must be cleared on rollback.
+    """
+
+    def __init__(self) -> None:
+        self._contracts: Optional[Dict[str, SplitContractInfo]] = None
+
+    def __len__(self) -> int:
+        return len(self._contracts or {})
+
+    def clear(self) -> None:
+        self._contracts = None
+
+    async def get(self, address: str) -> Optional[SplitContractInfo]:
+        if self._contracts is None:
+            self._contracts = await self._load()
+            _logger.info('Loaded %s split contracts', len(self._contracts))
+        return self._contracts.get(address)
+
+    def put(self, contract: models.SplitContract, core_participants: Iterable[str]) -> SplitContractInfo:
+        info = SplitContractInfo(
+            id=contract.id,
+            address=contract.contract_id,
+            signatures_required=contract.signatures_required,
+            core_participants=frozenset(core_participants),
+        )
+        # NOTE: Otherwise it will be loaded with the rest
+        if self._contracts is not None:
+            self._contracts[info.address] = info
+        return info
+
+    async def _load(self) -> Dict[str, SplitContractInfo]:
+        core_participants: DefaultDict[int, Set[str]] = defaultdict(set)
+        shareholders = models.Shareholder.filter(holder_type=models.ShareholderStatus.core_participant)
+        for split_contract_id, holder_id in await shareholders.values_list('split_contract_id', 'holder_id'):
+            core_participants[split_contract_id].add(holder_id)
+
+        contracts = await models.SplitContract.all().values_list('id', 'contract_id', 'signatures_required')
+        return {
+            address: SplitContractInfo(id_, address, signatures_required, frozenset(core_participants[id_]))
+            for id_, address, signatures_required in contracts
+        }
+
+
+holder_cache = HolderCache()
+tag_cache = TagCache()
+split_contracts = SplitContractRegistry()
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import DefaultDict, List
+
+from dipdup.context import DipDupContext
+from dipdup.utils.database import get_connection
+from tortoise.exceptions import IntegrityError
+
+import hicdex.models as models
+
+_logger = logging.getLogger(__name__)
+
+# NOTE: Growing with every operation; handlers look them up by unique keys and `on_restart` indexes, which are kept
+DEFERRED_TABLES = ('swap', 'token_holder', 'trade')
+
+_INDEXES_QUERY = '''
+SELECT c.relname AS name, t.relname AS table_name, pg_get_indexdef(i.indexrelid) AS definition
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_class t ON t.oid = i.indrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE n.nspname = $1 AND t.relname = ANY($2) AND NOT i.indisunique AND NOT i.indisprimary
+'''
+_FOREIGN_KEYS_QUERY = '''
+SELECT con.conname AS name, t.relname AS table_name, pg_get_constraintdef(con.oid) AS definition
+FROM pg_constraint con
+JOIN pg_class t ON t.oid = con.conrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE n.nspname = $1 AND t.relname = ANY($2) AND con.contype = 'f'
+'''
+
+
+async def defer_indexes(ctx: DipDupContext) -> None:
+    """Drop secondary indexes and foreign keys of `DEFERRED_TABLES`, saving definitions to `deferred_index`.
+
+    Called on fresh schema; `build_deferred_indexes` restores them once synchronized. If the process restarts
+    before that, DipDup recreates missing indexes on startup and `on_restart` builds foreign keys.
+    """
+    conn = get_connection()
+    schema_name = ctx.config.schema_name
+    _, indexes = await conn.execute_query(_INDEXES_QUERY, [schema_name, list(DEFERRED_TABLES)])
+    _, foreign_keys = await conn.execute_query(_FOREIGN_KEYS_QUERY, [schema_name, list(DEFERRED_TABLES)])
+
+    deferred = [
+        *(models.DeferredIndex(**dict(row), is_constraint=False) for row in indexes),
+        *(models.DeferredIndex(**dict(row), is_constraint=True) for row in foreign_keys),
+    ]
+    # NOTE: Restored snapshot could contain definitions saved before
+    await models.DeferredIndex.bulk_create(deferred, ignore_conflicts=True)
+
+    for row in foreign_keys:
+        await conn.execute_script(
+            f'ALTER TABLE "{schema_name}"."{row["table_name"]}" DROP CONSTRAINT "{row["name"]}"',
+        )
+    for row in indexes:
+        await conn.execute_script(f'DROP INDEX "{schema_name}"."{row["name"]}"')
+    _logger.info('Deferred %s indexes and %s foreign keys', len(indexes), len(foreign_keys))
+
+
+async def has_deferred_indexes() -> bool:
+    return await models.DeferredIndex.exists()
+
+
+async def build_deferred_indexes(ctx: DipDupContext) -> None:
+    """Create indexes and foreign keys saved by `defer_indexes` without blocking writes; tables are processed
+    in parallel. Safe to call again after an interrupted build.
+    """
+    by_table: DefaultDict[str, List[models.DeferredIndex]] = defaultdict(list)
+    for deferred in await models.DeferredIndex.all().order_by('name'):
+        by_table[deferred.table_name].append(deferred)
+    if not by_table:
+        return
+
+    _logger.info('Building deferred indexes of %s', ', '.join(sorted(by_table)))
+    await asyncio.gather(*(_build_table(ctx.config.schema_name, items) for items in by_table.values()))
+
+
+async def _build_table(schema_name: str, deferred: List[models.DeferredIndex]) -> None:
+    # NOTE: Indexes go first, foreign keys are validated when everything is in place
+    for item in sorted(deferred, key=lambda item: item.is_constraint):
+        if item.is_constraint:
+            # NOTE: Kept to be validated again on the next build
+            if not await _build_foreign_key(schema_name, item):
+                continue
+        else:
+            await _build_index(schema_name, item)
+        await models.DeferredIndex.filter(name=item.name).delete()
+
+
+async def _build_index(schema_name: str, item: models.DeferredIndex) -> None:
+    conn = get_connection()
+    index = f'"{schema_name}"."{item.name}"'
+    _, rows = await conn.execute_query('SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass($1)', [index])
+    if rows and rows[0]['indisvalid']:
+        return
+    if rows:
+        # NOTE: Left by interrupted `CREATE INDEX CONCURRENTLY`
+        await conn.execute_script(f'DROP INDEX CONCURRENTLY {index}')
+
+    _logger.info('Creating index `%s`', item.name)
+    await conn.execute_script(item.definition.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1))
+
+
+async def _build_foreign_key(schema_name: str, item: models.DeferredIndex) -> bool:
+    """Add foreign key and validate existing rows, return whether it's valid"""
+    conn = get_connection()
+    table = f'"{schema_name}"."{item.table_name}"'
+    _, rows = await conn.execute_query(
+        'SELECT convalidated FROM pg_constraint WHERE conrelid = to_regclass($1) AND conname = $2',
+        [table, item.name],
+    )
+    if rows and rows[0]['convalidated']:
+        return True
+    if not rows:
+        # NOTE: Enforced for new rows right away, existing ones are checked without locking writes
+        await conn.execute_script(f'ALTER TABLE {table} ADD CONSTRAINT "{item.name}" {item.definition} NOT VALID')
+
+    _logger.info('Validating foreign key `%s`', item.name)
+    try:
+        await conn.execute_script(f'ALTER TABLE {table} VALIDATE CONSTRAINT "{item.name}"')
+    except IntegrityError as e:
+        _logger.error('Foreign key `%s` is left not valid: %s', item.name, e)
+        return False
+    return True
@@ -0,0 +1,151 @@
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from dipdup.context import DipDupContext
+from dipdup.exceptions import ConfigurationError, DatabaseEngineError
+from dipdup.utils.database import get_connection
+
+from hicdex.utils import is_postgres
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+_logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 50_000
+EXPORT_LEVEL_RANGE = 100_000
+EXPORT_COMPRESSION = 'zstd'
+EXPORT_MANIFEST = 'manifest.json'
+
+# NOTE: Tables with a level column are exported by level range, the rest as full snapshots
+EXPORT_TABLES: Dict[str, Optional[str]] = {
+    'token': 'level',
+    'swap': 'level',
+    'trade': 'level',
+    'token_holder': None,
+}
+
+
+def _arrow_type(pg_type: str) -> 'pa.DataType':
+    return {
+        'int2': pa.int16(),
+        'int4': pa.int32(),
+        'int8': pa.int64(),
+        'bool': pa.bool_(),
+        'float8': pa.float64(),
+        'numeric': pa.string(),
+        'date': pa.date32(),
+        'timestamptz': pa.timestamp('us', tz='UTC'),
+        'timestamp': pa.timestamp('us'),
+    }.get(pg_type, pa.string())
+
+
+def _to_batch(rows: Sequence[Any], names: List[str], schema: 'pa.Schema') -> 'pa.RecordBatch':
+    arrays = []
+    for i, field in enumerate(schema):
+        column = [row[i] for row in rows]
+        if field.type == pa.string():
+            column = [value if value is None or isinstance(value, str) else json.dumps(value) for value in column]
+        arrays.append(pa.array(column, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+class TableExporter:
+    """Stream query results from a server-side cursor into a compressed Parquet file"""
+
+    def __init__(self, conn: Any, batch_size: int = EXPORT_BATCH_SIZE) -> None:
+        self._conn = conn
+        self._batch_size = batch_size
+
+    async def export(self, path: Path, query: str, *args: Any) -> int:
+        """Write query results to `path`, return number of rows; no file is created for empty results"""
+        statement = await self._conn.prepare(query)
+        attributes = statement.get_attributes()
+        names = [attribute.name for attribute in attributes]
+        schema = pa.schema([(attribute.name, _arrow_type(attribute.type.name)) for attribute in attributes])
+
+        rows_total = 0
+        tmp_path = path.with_suffix('.tmp')
+        writer: Optional[pq.ParquetWriter] = None
+        try:
+            cursor = await statement.cursor(*args)
+            while rows := await cursor.fetch(self._batch_size):
+                if writer is None:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    writer = pq.ParquetWriter(tmp_path, schema, compression=EXPORT_COMPRESSION)
+                writer.write_batch(_to_batch(rows, names, schema))
+                rows_total += len(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is not None:
+            tmp_path.rename(path)
+        return rows_total
+
+
+def load_manifest(path: Path) -> Dict[str, int]:
+    manifest_path = path / EXPORT_MANIFEST
+    if not manifest_path.exists():
+        return {}
+    return json.loads(manifest_path.read_text())
+
+
+def save_manifest(path: Path, manifest: Dict[str, int]) -> None:
+    manifest_path = path / EXPORT_MANIFEST
+    manifest_path.with_suffix('.tmp').write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    manifest_path.with_suffix('.tmp').rename(manifest_path)
+
+
+async def export_snapshot(ctx: DipDupContext, path: Path) -> None:
+    """Export indexed tables to Parquet files under `path`, continuing from the last exported level.
+
+    Tables with a level column get one file per level range; `token_holder` is written as a full snapshot.
+    Rows are read in a single repeatable read transaction, so all files of a run are consistent. Ranges are not
+    exported again, so later changes of their rows are missing; see `export_tables` hook. Swaps move to the
+    later range when canceled, dedupe by primary key.
+    """
+    if pa is None:
+        raise ConfigurationError('`pyarrow` package is required to export tables')
+    if not is_postgres(ctx):
+        raise DatabaseEngineError(msg='Exporting tables is not supported', kind='sqlite', required='postgres')
+
+    path.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(path)
+    async with get_connection().acquire_connection() as raw_conn:
+        async with raw_conn.transaction(isolation='repeatable_read', readonly=True):
+            # NOTE: Levels within rollback depth can still change
+            head = await raw_conn.fetchval('SELECT MIN(level) FROM dipdup_index')
+            head = (head or 0) - ctx.config.advanced.rollback_depth
+            exporter = TableExporter(raw_conn)
+
+            for table, level_column in EXPORT_TABLES.items():
+                if level_column is None:
+                    file = path / table / f'snapshot-{head:010d}.parquet'
+                    rows = await exporter.export(file, f'SELECT * FROM {table}')
+                    for stale in (path / table).glob('snapshot-*.parquet'):
+                        if stale != file:
+                            stale.unlink()
+                    _logger.info('Exported %s rows of `%s` at level %s', rows, table, head)
+                    manifest[table] = head
+                    save_manifest(path, manifest)
+                    continue
+
+                last_level = manifest.get(table, 0)
+                while last_level < head:
+                    next_level = min(last_level + EXPORT_LEVEL_RANGE, head)
+                    file = path / table / f'{last_level + 1:010d}-{next_level:010d}.parquet'
+                    rows = await exporter.export(
+                        file,
+                        f'SELECT * FROM {table} WHERE {level_column} > $1 AND {level_column} <= $2',
+                        last_level,
+                        next_level,
+                    )
+                    _logger.info('Exported %s rows of `%s` from levels %s-%s', rows, table, last_level + 1, next_level)
+                    manifest[table] = last_level = next_level
+                    save_manifest(path, manifest)
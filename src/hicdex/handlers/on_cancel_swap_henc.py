@@ -2,18 +2,24 @@ from dipdup.context import HandlerContext
 from dipdup.models import Transaction
 
 import hicdex.models as models
+from hicdex.metrics import instrumented
+from hicdex.rollups import remove_listing
 from hicdex.types.henc_swap.parameter.cancel_swap import CancelSwapParameter
 from hicdex.types.henc_swap.storage import HencSwapStorage
+from hicdex.unit_of_work import UnitOfWork
 
 
+@instrumented
 async def on_cancel_swap_henc(
     ctx: HandlerContext,
     cancel_swap: Transaction[CancelSwapParameter, HencSwapStorage],
 ) -> None:
-    swap = await models.Swap.filter(
-        id=int(cancel_swap.parameter.__root__),
-        contract_address=cancel_swap.data.target_address,
-    ).get()
-    swap.status = models.SwapStatus.CANCELED
-    swap.level = cancel_swap.data.level
-    await swap.save()
+    assert cancel_swap.data.target_address is not None
+    async with UnitOfWork() as uow:
+        swap = await uow.get_swap(
+            swap_id=int(cancel_swap.parameter.__root__),
+            contract_address=cancel_swap.data.target_address,
+        )
+        swap.status = models.SwapStatus.CANCELED
+        swap.level = cancel_swap.data.level
+        await remove_listing(uow, swap)
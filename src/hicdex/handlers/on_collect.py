@@ -2,35 +2,41 @@ from dipdup.context import HandlerContext
 from dipdup.models import Transaction
 
 import hicdex.models as models
+from hicdex.metrics import instrumented
+from hicdex.rollups import record_trade, remove_listing
 from hicdex.types.hen_minter.parameter.collect import CollectParameter
 from hicdex.types.hen_minter.storage import HenMinterStorage
+from hicdex.unit_of_work import UnitOfWork
 
 
+@instrumented
 async def on_collect(
     ctx: HandlerContext,
     collect: Transaction[CollectParameter, HenMinterStorage],
 ) -> None:
-    swap = await models.Swap.filter(
-        id=collect.parameter.swap_id,
-        contract_address=collect.data.target_address,
-    ).get()
-    seller = await swap.creator
-    buyer, _ = await models.Holder.get_or_create(address=collect.data.sender_address)
-    token = await swap.token.get()
+    assert collect.data.sender_address is not None and collect.data.target_address is not None
+    async with UnitOfWork() as uow:
+        swap = await uow.get_swap(
+            swap_id=int(collect.parameter.swap_id),
+            contract_address=collect.data.target_address,
+        )
+        buyer = await uow.get_holder(collect.data.sender_address)
+        amount = int(collect.parameter.objkt_amount)
 
-    trade = models.Trade(
-        swap=swap,
-        seller=seller,
-        buyer=buyer,
-        token=token,
-        amount=int(collect.parameter.objkt_amount),
-        ophash=collect.data.hash,
-        level=collect.data.level,
-        timestamp=collect.data.timestamp,
-    )
-    await trade.save()
+        trade = models.Trade(
+            swap_id=swap.opid,
+            seller_id=swap.creator_id,
+            buyer_id=buyer.address,
+            token_id=swap.token_id,
+            amount=amount,
+            ophash=collect.data.hash,
+            level=collect.data.level,
+            timestamp=collect.data.timestamp,
+        )
+        uow.add(trade)
+        await record_trade(uow, swap, trade)
 
-    swap.amount_left -= int(collect.parameter.objkt_amount)
-    if swap.amount_left == 0:
-        swap.status = models.SwapStatus.FINISHED
-    await swap.save()
+        swap.amount_left -= amount
+        if swap.amount_left == 0:
+            swap.status = models.SwapStatus.FINISHED
+            await remove_listing(uow, swap)
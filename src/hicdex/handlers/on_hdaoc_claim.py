@@ -1,19 +1,22 @@
 from dipdup.context import HandlerContext
 from dipdup.models import Transaction
 
-import hicdex.models as models
+from hicdex.metrics import instrumented
 from hicdex.types.hdao_curation.parameter.claim_h_dao import ClaimHDAOParameter
 from hicdex.types.hdao_curation.storage import HdaoCurationStorage
+from hicdex.unit_of_work import UnitOfWork
 
 
+@instrumented
 async def on_hdaoc_claim(
     ctx: HandlerContext,
     claim_h_dao: Transaction[ClaimHDAOParameter, HdaoCurationStorage],
 ) -> None:
-    receiver, _ = await models.Holder.get_or_create(address=claim_h_dao.data.sender_address)
-    receiver.hdao_balance += int(claim_h_dao.parameter.hDAO_amount)
-    await receiver.save()
+    assert claim_h_dao.data.sender_address is not None
+    async with UnitOfWork() as uow:
+        receiver = await uow.get_holder(claim_h_dao.data.sender_address)
+        receiver.hdao_balance += int(claim_h_dao.parameter.hDAO_amount)
 
-    token = await models.Token.filter(id=int(claim_h_dao.parameter.objkt_id)).get()
-    token.hdao_balance -= int(claim_h_dao.parameter.hDAO_amount)
-    await token.save()
+        await uow.increment_token(
+            int(claim_h_dao.parameter.objkt_id), 'hdao_balance', -int(claim_h_dao.parameter.hDAO_amount)
+        )
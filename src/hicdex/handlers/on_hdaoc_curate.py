@@ -1,15 +1,16 @@
 from dipdup.context import HandlerContext
 from dipdup.models import Transaction
 
-import hicdex.models as models
+from hicdex.metrics import instrumented
 from hicdex.types.hdao_curation.parameter.curate import CurateParameter
 from hicdex.types.hdao_curation.storage import HdaoCurationStorage
+from hicdex.unit_of_work import UnitOfWork
 
 
+@instrumented
 async def on_hdaoc_curate(
     ctx: HandlerContext,
     curate: Transaction[CurateParameter, HdaoCurationStorage],
 ) -> None:
-    token = await models.Token.filter(id=int(curate.parameter.objkt_id)).get()
-    token.hdao_balance += int(curate.parameter.hDAO_amount)
-    await token.save()
+    async with UnitOfWork() as uow:
+        await uow.increment_token(int(curate.parameter.objkt_id), 'hdao_balance', int(curate.parameter.hDAO_amount))
@@ -1,16 +1,18 @@
 from dipdup.context import HandlerContext
 from dipdup.models import Transaction
 
-import hicdex.models as models
+from hicdex.metrics import instrumented
 from hicdex.types.hdao_ledger.parameter.h_dao_batch import HDAOBatchParameter
 from hicdex.types.hdao_ledger.storage import HdaoLedgerStorage
+from hicdex.unit_of_work import UnitOfWork
 
 
+@instrumented
 async def on_hdaol_batch(
     ctx: HandlerContext,
     h_dao_batch: Transaction[HDAOBatchParameter, HdaoLedgerStorage],
 ) -> None:
-    for t in h_dao_batch.parameter.__root__:
-        receiver, _ = await models.Holder.get_or_create(address=t.to_)
-        receiver.hdao_balance += int(t.amount)
-        await receiver.save()
+    async with UnitOfWork() as uow:
+        for t in h_dao_batch.parameter.__root__:
+            receiver = await uow.get_holder(t.to_)
+            receiver.hdao_balance += int(t.amount)
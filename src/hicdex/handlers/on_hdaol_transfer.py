@@ -1,20 +1,21 @@
 from dipdup.context import HandlerContext
 from dipdup.models import Transaction
 
-import hicdex.models as models
+from hicdex.metrics import instrumented
 from hicdex.types.hdao_ledger.parameter.transfer import TransferParameter
 from hicdex.types.hdao_ledger.storage import HdaoLedgerStorage
+from hicdex.unit_of_work import UnitOfWork
 
 
+@instrumented
 async def on_hdaol_transfer(
     ctx: HandlerContext,
     transfer: Transaction[TransferParameter, HdaoLedgerStorage],
 ) -> None:
-    for t in transfer.parameter.__root__:
-        sender, _ = await models.Holder.get_or_create(address=t.from_)
-        for tx in t.txs:
-            receiver, _ = await models.Holder.get_or_create(address=tx.to_)
-            sender.hdao_balance -= int(tx.amount)
-            receiver.hdao_balance += int(tx.amount)
-            await receiver.save()
-        await sender.save()
+    async with UnitOfWork() as uow:
+        for t in transfer.parameter.__root__:
+            sender = await uow.get_holder(t.from_)
+            for tx in t.txs:
+                receiver = await uow.get_holder(tx.to_)
+                sender.hdao_balance -= int(tx.amount)
+                receiver.hdao_balance += int(tx.amount)
@@ -2,55 +2,60 @@ from dipdup.context import HandlerContext
 from dipdup.models import Transaction
 
 import hicdex.models as models
-from hicdex.metadata_utils import fix_token_metadata
+from hicdex.metadata_queue import enqueue_token
+from hicdex.metrics import instrumented
+from hicdex.rollups import touch_holder, update_holding
 from hicdex.types.hen_minter.parameter.mint_objkt import MintOBJKTParameter
 from hicdex.types.hen_minter.storage import HenMinterStorage
 from hicdex.types.hen_objkts.parameter.mint import MintParameter
 from hicdex.types.hen_objkts.storage import HenObjktsStorage
+from hicdex.unit_of_work import UnitOfWork
 from hicdex.utils import fromhex
 
 
+@instrumented
 async def on_mint(
     ctx: HandlerContext,
     mint_objkt: Transaction[MintOBJKTParameter, HenMinterStorage],
     mint: Transaction[MintParameter, HenObjktsStorage],
 ) -> None:
-    holder, _ = await models.Holder.get_or_create(address=mint.parameter.address)
-
-    creator = holder
-    if mint.parameter.address != mint_objkt.data.sender_address:
-        creator, _ = await models.Holder.get_or_create(address=mint_objkt.data.sender_address)
-
-    if await models.Token.exists(id=mint.parameter.token_id):
-        return
-
-    metadata = ''
-    if mint_objkt.parameter.metadata:
-        metadata = fromhex(mint_objkt.parameter.metadata)
-
-    token = models.Token(
-        id=mint.parameter.token_id,
-        royalties=mint_objkt.parameter.royalties,
-        title='',
-        description='',
-        artifact_uri='',
-        display_uri='',
-        thumbnail_uri='',
-        metadata=metadata,
-        mime='',
-        creator=creator,
-        supply=mint.parameter.amount,
-        level=mint.data.level,
-        timestamp=mint.data.timestamp,
-    )
-    await token.save()
-
-    seller_holding, _ = await models.TokenHolder.get_or_create(
-        token=token,
-        holder=holder,
-        quantity=int(mint.parameter.amount),
-    )
-    await seller_holding.save()
+    assert mint_objkt.data.sender_address is not None
+    async with UnitOfWork() as uow:
+        holder = await uow.get_holder(mint.parameter.address)
+
+        creator = holder
+        if mint.parameter.address != mint_objkt.data.sender_address:
+            creator = await uow.get_holder(mint_objkt.data.sender_address)
+
+        if await models.Token.exists(id=mint.parameter.token_id):
+            return
+
+        metadata = ''
+        if mint_objkt.parameter.metadata:
+            metadata = fromhex(mint_objkt.parameter.metadata)
+
+        token = models.Token(
+            id=mint.parameter.token_id,
+            royalties=mint_objkt.parameter.royalties,
+            title='',
+            description='',
+            artifact_uri='',
+            display_uri='',
+            thumbnail_uri='',
+            metadata=metadata,
+            mime='',
+            creator_id=creator.address,
+            supply=mint.parameter.amount,
+            level=mint.data.level,
+            timestamp=mint.data.timestamp,
+        )
+        uow.add(token)
+
+        seller_holding = await uow.get_token_holder(token, holder)
+        update_holding(holder, seller_holding, int(mint.parameter.amount))
+        creator.tokens_created += 1
+        touch_holder(creator, mint.data.level)
+        touch_holder(holder, mint.data.level)
 
     if not token.artifact_uri and not token.title:
-        await fix_token_metadata(ctx, token)
+        await enqueue_token(token.id, mint.data.level)
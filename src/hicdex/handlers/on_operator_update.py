@@ -1,38 +1,60 @@
+from typing import Dict, Tuple
+
 from dipdup.context import HandlerContext
 from dipdup.models import Transaction
 
 import hicdex.models as models
+from hicdex.metrics import instrumented
 from hicdex.types.hen_objkts.parameter.update_operators import (
     UpdateOperatorsParameter,
     UpdateOperatorsParameterItem,
     UpdateOperatorsParameterItem1,
 )
 from hicdex.types.hen_objkts.storage import HenObjktsStorage
-
-# from pprint import pformat
-# ctx.logger.warning(pformat(op.remove_operator))
+from hicdex.unit_of_work import UnitOfWork
 
 
+@instrumented
 async def on_operator_update(
     ctx: HandlerContext,
     update_operators: Transaction[UpdateOperatorsParameter, HenObjktsStorage],
 ) -> None:
+    # NOTE: Whether (token id, owner, operator) is approved after the call; the last update of a key wins
+    approved: Dict[Tuple[int, str, str], bool] = {}
     for op in update_operators.parameter.__root__:
-        try:
-            if isinstance(op, UpdateOperatorsParameterItem):
-                data_add = op.add_operator
-                token, _ = await models.Token.get_or_create(id=int(data_add.token_id))
-                owner, _ = await models.Holder.get_or_create(address=data_add.owner)
-                operator = data_add.operator
-                token_operator = await models.TokenOperator.create(
-                    token=token, owner=owner, operator=operator, level=update_operators.data.level
+        if isinstance(op, UpdateOperatorsParameterItem):
+            added = op.add_operator
+            approved[int(added.token_id), added.owner, added.operator] = True
+        if isinstance(op, UpdateOperatorsParameterItem1):
+            removed = op.remove_operator
+            approved[int(removed.token_id), removed.owner, removed.operator] = False
+    if not approved:
+        return
+
+    token_ids = {token_id for token_id, _, _ in approved}
+    owners = {owner for _, owner, _ in approved}
+    async with UnitOfWork() as uow:
+        await uow.prefetch_holders(owners)
+        await uow.prefetch_tokens(token_ids, create=True)
+
+        token_operators = await models.TokenOperator.filter(token_id__in=token_ids, owner_id__in=owners)
+        # NOTE: Filter matches all combinations of requested tokens and owners
+        stored = {
+            (token_operator.token_id, token_operator.owner_id, token_operator.operator): token_operator.id
+            for token_operator in token_operators
+        }
+        for (token_id, owner, operator), is_approved in approved.items():
+            if is_approved and (token_id, owner, operator) not in stored:
+                uow.add(
+                    models.TokenOperator(
+                        token_id=token_id,
+                        owner_id=owner,
+                        operator=operator,
+                        level=update_operators.data.level,
+                    )
                 )
-            if isinstance(op, UpdateOperatorsParameterItem1):
-                data_remove = op.remove_operator
-                token, _ = await models.Token.get_or_create(id=int(data_remove.token_id))
-                owner, _ = await models.Holder.get_or_create(address=data_remove.owner)
-                operator = data_remove.operator
-                token_operator = await models.TokenOperator.filter(token=token, owner=owner, operator=operator).get()
-                await token_operator.delete()
-        except Exception as exc:
-            ctx.logger.error('Failed to update token %s: %s', token.id, exc)
+
+        # NOTE: Removing operators which are not set is a no-op
+        removed_ids = [stored[key] for key, is_approved in approved.items() if not is_approved and key in stored]
+        if removed_ids:
+            await models.TokenOperator.filter(id__in=removed_ids).delete()
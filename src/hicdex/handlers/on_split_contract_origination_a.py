@@ -2,9 +2,13 @@ from dipdup.context import HandlerContext
 from dipdup.models import Origination
 
 import hicdex.models as models
+from hicdex.cache import split_contracts
+from hicdex.metrics import instrumented
 from hicdex.types.split_contract_a.storage import SplitContractAStorage
+from hicdex.unit_of_work import UnitOfWork
 
 
+@instrumented
 async def on_split_contract_origination_a(
     ctx: HandlerContext,
     split_contract_a_origination: Origination[SplitContractAStorage],
@@ -17,28 +21,38 @@ async def on_split_contract_origination_a(
         return
 
     contract_address = split_contract_a_origination.data.originated_contract_address
+    assert contract_address is not None
     shares = split_contract_a_origination.storage.shares
     administrator = split_contract_a_origination.storage.administrator
     total_shares = split_contract_a_origination.storage.totalShares
-    core_participants = split_contract_a_origination.storage.coreParticipants
+    core_participants = {
+        address for address in split_contract_a_origination.storage.coreParticipants if address in shares
+    }
 
-    holder, _ = await models.Holder.get_or_create(address=contract_address)
-    holder.is_split = True
-    await holder.save()
-    contract, _ = await models.SplitContract.get_or_create(
-        contract=holder,
-        administrator=administrator,
-        total_shares=total_shares,
-    )
+    async with UnitOfWork() as uow:
+        await uow.prefetch_holders((contract_address, *shares))
+        holder = await uow.get_holder(contract_address)
+        holder.is_split = True
+        # NOTE: Holders must be inserted before the contract referencing them
+        await uow.flush()
 
-    for address, share in shares.items():
-        holder, _ = await models.Holder.get_or_create(address=address)
-        holder_type = models.ShareholderStatus.benefactor
-        if address in core_participants:
-            holder_type = models.ShareholderStatus.core_participant
-        await models.Shareholder.get_or_create(
-            split_contract=contract,
-            holder=holder,
-            shares=int(share),
-            holder_type=holder_type,
+        contract = await models.SplitContract.create(
+            contract_id=contract_address,
+            administrator=administrator,
+            total_shares=total_shares,
+            signatures_required=len(core_participants),
         )
+        for address, share in shares.items():
+            holder_type = models.ShareholderStatus.benefactor
+            if address in core_participants:
+                holder_type = models.ShareholderStatus.core_participant
+            uow.add(
+                models.Shareholder(
+                    split_contract_id=contract.id,
+                    holder_id=address,
+                    shares=int(share),
+                    holder_type=holder_type,
+                )
+            )
+
+    split_contracts.put(contract, core_participants)
@@ -2,32 +2,36 @@ from dipdup.context import HandlerContext
 from dipdup.models import Transaction
 
 import hicdex.models as models
+from hicdex.cache import split_contracts
+from hicdex.metrics import instrumented
 from hicdex.types.split_sign.parameter.sign import SignParameter
 from hicdex.types.split_sign.storage import SplitSignStorage
+from hicdex.unit_of_work import UnitOfWork
 
 
+@instrumented
 async def on_split_sign(
     ctx: HandlerContext,
     sign: Transaction[SignParameter, SplitSignStorage],
 ) -> None:
     sender = sign.data.sender_address
-    objkt_id = sign.parameter.__root__
+    token_id = int(sign.parameter.__root__)
 
-    token, _ = await models.Token.get_or_create(id=int(objkt_id))
-    contract, _ = await models.SplitContract.get_or_create(contract_id=token.creator_id)
+    async with UnitOfWork() as uow:
+        await uow.prefetch_tokens((token_id,), create=True)
+        token = await uow.get_token(token_id)
+        if uow.is_pending(token):
+            await uow.flush()
+        contract = await split_contracts.get(token.creator_id)
+        if contract is None:
+            # NOTE: Tokens not minted by split contracts get an empty one and are signed by anyone
+            split_contract, _ = await models.SplitContract.get_or_create(contract_id=token.creator_id)
+            contract = split_contracts.put(split_contract, ())
 
-    await models.Signatures.get_or_create(holder_id=sender, token_id=token.id)
+        _, created = await models.Signatures.get_or_create(holder_id=sender, token_id=token.id)
+        # NOTE: Only signatures of core participants are required, each one is counted once
+        if created and sender in contract.core_participants:
+            token.signatures_collected += 1
 
-    try:
-        core_participants = await models.Shareholder.filter(
-            split_contract=contract, holder_type=models.ShareholderStatus.core_participant
-        ).all()
-        sig_required = {sharesholder.holder_id for sharesholder in core_participants}
-        signers = await models.Signatures.filter(token=token).all()
-        sig_created = {signer.holder_id for signer in signers}
-
-        if sig_required.issubset(sig_created):
+        if token.signatures_collected >= contract.signatures_required:
             token.is_signed = True
-            await token.save()
-    except Exception as exc:
-        ctx.logger.error('Failed to update token %s: %s', token.id, exc)
@@ -2,25 +2,26 @@ import logging
 from typing import Dict
 
 from dipdup.context import HandlerContext
-from dipdup.enums import MessageType
 from dipdup.models import Transaction
 
-import hicdex.models as models
-from hicdex.metadata_utils import fetch_metadata_ipfs
+from hicdex.metadata_queue import enqueue_holder
+from hicdex.metrics import instrumented
 from hicdex.types.hen_subjkt.parameter.registry import RegistryParameter
 from hicdex.types.hen_subjkt.storage import HenSubjktStorage
+from hicdex.unit_of_work import UnitOfWork
 from hicdex.utils import fromhex
 
 _logger = logging.getLogger(__name__)
 
 
+@instrumented
 async def on_subjkt_register(
     ctx: HandlerContext,
     registry: Transaction[RegistryParameter, HenSubjktStorage],
 ) -> None:
     addr = registry.data.sender_address
+    assert addr is not None
     _logger.info(f'{addr}')
-    holder, _ = await models.Holder.get_or_create(address=addr)
 
     name = fromhex(registry.parameter.subjkt)
     _logger.info(f'{name}')
@@ -28,17 +29,14 @@ async def on_subjkt_register(
     _logger.info(f'{metadata_file}')
     metadata: Dict[str, str] = {}
 
-    holder.name = name
-    holder.metadata_file = metadata_file
-    holder.metadata = metadata
-
-    level = ctx.get_tzkt_datasource("tzkt_mainnet").get_channel_level(MessageType.head)
-    if registry.data.level > level - 200 and metadata_file.startswith('ipfs://'):
-        _logger.info("Fetching IPFS metadata")
-        holder.metadata = await fetch_metadata_ipfs(ctx, holder.metadata_file)
-    else:
-        _logger.info("Skipping metadata fetch")
-
-    holder.description = holder.metadata.get('description', '')
-
-    await holder.save()
+    async with UnitOfWork() as uow:
+        holder = await uow.get_holder(addr)
+        holder.name = name
+        holder.metadata_file = metadata_file
+        holder.metadata = metadata
+        # NOTE: Previous description is kept until the queued metadata is resolved
+        if not metadata_file.startswith('ipfs://'):
+            holder.description = ''
+
+    if metadata_file.startswith('ipfs://'):
+        await enqueue_holder(holder.address, registry.data.level)
@@ -2,37 +2,44 @@ from dipdup.context import HandlerContext
 from dipdup.models import Transaction
 
 import hicdex.models as models
-from hicdex.metadata_utils import fix_token_metadata
+from hicdex.metadata_queue import enqueue_token
+from hicdex.metrics import instrumented
+from hicdex.rollups import add_listing
 from hicdex.types.hen_minter.parameter.swap import SwapParameter
 from hicdex.types.hen_minter.storage import HenMinterStorage
+from hicdex.unit_of_work import UnitOfWork
 
 
+@instrumented
 async def on_swap(
     ctx: HandlerContext,
     swap: Transaction[SwapParameter, HenMinterStorage],
 ) -> None:
-    holder, _ = await models.Holder.get_or_create(address=swap.data.sender_address)
-    token = await models.Token.filter(id=int(swap.parameter.objkt_id)).get()
+    assert swap.data.sender_address is not None
     fa2, _ = await models.FA2.get_or_create(contract='KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton')
+    async with UnitOfWork() as uow:
+        holder = await uow.get_holder(swap.data.sender_address)
+        token = await uow.get_token(int(swap.parameter.objkt_id))
 
-    swap_model = models.Swap(
-        id=int(swap.storage.swap_id) - 1,
-        creator=holder,
-        token=token,
-        price=swap.parameter.xtz_per_objkt,
-        amount=swap.parameter.objkt_amount,
-        amount_left=swap.parameter.objkt_amount,
-        status=models.SwapStatus.ACTIVE,
-        opid=swap.data.id,
-        ophash=swap.data.hash,
-        level=swap.data.level,
-        timestamp=swap.data.timestamp,
-        royalties=token.royalties,
-        fa2=fa2,
-        contract_address=swap.data.target_address,
-        contract_version=1,
-    )
-    await swap_model.save()
+        swap_model = models.Swap(
+            id=int(swap.storage.swap_id) - 1,
+            creator_id=holder.address,
+            token_id=token.id,
+            price=swap.parameter.xtz_per_objkt,
+            amount=swap.parameter.objkt_amount,
+            amount_left=swap.parameter.objkt_amount,
+            status=models.SwapStatus.ACTIVE,
+            opid=swap.data.id,
+            ophash=swap.data.hash,
+            level=swap.data.level,
+            timestamp=swap.data.timestamp,
+            royalties=token.royalties,
+            fa2=fa2,
+            contract_address=swap.data.target_address,
+            contract_version=1,
+        )
+        uow.add(swap_model)
+        await add_listing(uow, swap_model, token)
 
     if not token.artifact_uri and not token.title:
-        await fix_token_metadata(ctx, token)
+        await enqueue_token(token.id, swap.data.level)
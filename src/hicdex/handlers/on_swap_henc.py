@@ -2,41 +2,49 @@ from dipdup.context import HandlerContext
 from dipdup.models import Transaction
 
 import hicdex.models as models
-from hicdex.metadata_utils import fix_token_metadata
+from hicdex.metadata_queue import enqueue_token
+from hicdex.metrics import instrumented
+from hicdex.rollups import add_listing
 from hicdex.types.henc_swap.parameter.swap import SwapParameter
 from hicdex.types.henc_swap.storage import HencSwapStorage
+from hicdex.unit_of_work import UnitOfWork
 
 
+@instrumented
 async def on_swap_henc(
     ctx: HandlerContext,
     swap: Transaction[SwapParameter, HencSwapStorage],
 ) -> None:
-    holder, _ = await models.Holder.get_or_create(address=swap.data.sender_address)
-    token, _ = await models.Token.get_or_create(id=int(swap.parameter.objkt_id))
+    assert swap.data.sender_address is not None
     swap_id = int(swap.storage.counter) - 1
     fa2, _ = await models.FA2.get_or_create(contract=swap.parameter.fa2)
+    async with UnitOfWork() as uow:
+        holder = await uow.get_holder(swap.data.sender_address)
+        await uow.prefetch_tokens((int(swap.parameter.objkt_id),), create=True)
+        token = await uow.get_token(int(swap.parameter.objkt_id))
 
-    is_valid = swap.parameter.creator == token.creator_id and int(swap.parameter.royalties) == int(token.royalties)
+        is_valid = swap.parameter.creator == token.creator_id and int(swap.parameter.royalties) == int(token.royalties)
 
-    swap_model = models.Swap(
-        id=swap_id,
-        creator=holder,
-        token=token,
-        price=swap.parameter.xtz_per_objkt,
-        amount=swap.parameter.objkt_amount,
-        amount_left=swap.parameter.objkt_amount,
-        status=models.SwapStatus.ACTIVE,
-        opid=swap.data.id,
-        ophash=swap.data.hash,
-        level=swap.data.level,
-        timestamp=swap.data.timestamp,
-        royalties=swap.parameter.royalties,
-        fa2=fa2,
-        contract_address=swap.data.target_address,
-        contract_version=3,  # the contract id (NOT THE VERSION ;-))
-        is_valid=is_valid,
-    )
-    await swap_model.save()
+        swap_model = models.Swap(
+            id=swap_id,
+            creator_id=holder.address,
+            token_id=token.id,
+            price=swap.parameter.xtz_per_objkt,
+            amount=swap.parameter.objkt_amount,
+            amount_left=swap.parameter.objkt_amount,
+            status=models.SwapStatus.ACTIVE,
+            opid=swap.data.id,
+            ophash=swap.data.hash,
+            level=swap.data.level,
+            timestamp=swap.data.timestamp,
+            royalties=swap.parameter.royalties,
+            fa2=fa2,
+            contract_address=swap.data.target_address,
+            contract_version=3,  # the contract id (NOT THE VERSION ;-))
+            is_valid=is_valid,
+        )
+        uow.add(swap_model)
+        await add_listing(uow, swap_model, token)
 
     if not token.artifact_uri and not token.title:
-        await fix_token_metadata(ctx, token)
+        await enqueue_token(token.id, swap.data.level)
@@ -1,28 +1,46 @@
+from collections import defaultdict
+from typing import DefaultDict, Tuple
+
 from dipdup.context import HandlerContext
 from dipdup.models import Transaction
 
-import hicdex.models as models
+from hicdex.metrics import instrumented
+from hicdex.rollups import count_holding, touch_holder
 from hicdex.types.hen_objkts.parameter.transfer import TransferParameter
 from hicdex.types.hen_objkts.storage import HenObjktsStorage
+from hicdex.unit_of_work import UnitOfWork
+
+BURN_ADDRESS = 'tz1burnburnburnburnburnburnburjAYjjX'
 
 
+@instrumented
 async def on_transfer(
     ctx: HandlerContext,
     transfer: Transaction[TransferParameter, HenObjktsStorage],
 ) -> None:
+    # NOTE: Net changes of (token id, holder address) across all txs of the operation
+    deltas: DefaultDict[Tuple[int, str], int] = defaultdict(int)
+    burned: DefaultDict[int, int] = defaultdict(int)
+    addresses = set()
     for t in transfer.parameter.__root__:
-        sender, _ = await models.Holder.get_or_create(address=t.from_)
+        addresses.add(t.from_)
         for tx in t.txs:
-            receiver, _ = await models.Holder.get_or_create(address=tx.to_)
-            token = await models.Token.filter(id=int(tx.token_id)).get()
+            token_id, amount = int(tx.token_id), int(tx.amount)
+            addresses.add(tx.to_)
+            deltas[token_id, t.from_] -= amount
+            deltas[token_id, tx.to_] += amount
+            if tx.to_ == BURN_ADDRESS:
+                burned[token_id] += amount
 
-            sender_holding, _ = await models.TokenHolder.get_or_create(token=token, holder=sender)
-            sender_holding.quantity -= int(tx.amount)
-            await sender_holding.save()
-            receiver_holding, _ = await models.TokenHolder.get_or_create(token=token, holder=receiver)
-            receiver_holding.quantity += int(tx.amount)
-            await receiver_holding.save()
+    async with UnitOfWork() as uow:
+        await uow.prefetch_holders(addresses)
+        changed = {key: amount for key, amount in deltas.items() if amount}
+        quantities = await uow.increment_token_holders(changed)
+        for (token_id, address), amount in changed.items():
+            quantity = quantities[token_id, address]
+            count_holding(await uow.get_holder(address), quantity - amount, quantity)
+        for address in addresses:
+            touch_holder(await uow.get_holder(address), transfer.data.level)
 
-            if tx.to_ == 'tz1burnburnburnburnburnburnburjAYjjX':
-                token.supply -= int(tx.amount)
-                await token.save()
+        for token_id, amount in burned.items():
+            await uow.increment_token(token_id, 'supply', -amount)
@@ -0,0 +1,11 @@
+from dipdup.context import HookContext
+
+import hicdex.deferred_indexes as deferred_indexes
+from hicdex.metrics import instrumented
+
+
+@instrumented
+async def build_deferred_indexes(
+    ctx: HookContext,
+) -> None:
+    await deferred_indexes.build_deferred_indexes(ctx)
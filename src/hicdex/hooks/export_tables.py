@@ -0,0 +1,20 @@
+from pathlib import Path
+
+from dipdup.context import HookContext
+
+from hicdex.export import export_snapshot
+
+
+async def export_tables(
+    ctx: HookContext,
+) -> None:
+    """Export new level ranges of indexed tables to `custom.export_path`.
+
+    A level range is exported once, with rows as they were at that moment. Changes made to them later are not
+    exported again: `token` supply, floor price and metadata, and swaps finished by a collect (collects don't
+    move `swap.level`). Canceled swaps do move to a later range. Only the `token_holder` snapshot is always
+    current. To refresh a table, delete its files and its entry in `manifest.json`; it is exported again from
+    level 0 on the next run.
+    """
+    if path := ctx.config.custom.get('export_path'):
+        await export_snapshot(ctx, Path(path))
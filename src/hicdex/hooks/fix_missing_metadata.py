@@ -2,11 +2,15 @@ import logging
 
 from dipdup.context import HookContext
 
+from hicdex.ipfs import prune_cache
 from hicdex.metadata_utils import fix_holder_metadata, fix_other_metadata
+from hicdex.metrics import instrumented
 
 
+@instrumented
 async def fix_missing_metadata(
     ctx: HookContext,
 ) -> None:
     await fix_holder_metadata(ctx)
     await fix_other_metadata(ctx)
+    await prune_cache(ctx)
@@ -1,6 +1,8 @@
 from dipdup.context import HookContext
 from dipdup.index import Index
 
+from hicdex.cache import holder_cache, split_contracts
+
 
 async def on_index_rollback(
     ctx: HookContext,
@@ -14,3 +16,5 @@ async def on_index_rollback(
         from_level=from_level,
         to_level=to_level,
     )
+    holder_cache.clear()
+    split_contracts.clear()
@@ -1,7 +1,18 @@
+from pathlib import Path
+
 from dipdup.context import HookContext
 
+from hicdex.deferred_indexes import defer_indexes
+from hicdex.snapshot import restore_snapshot
+from hicdex.utils import is_enabled, is_postgres
+
 
 async def on_reindex(
     ctx: HookContext,
 ) -> None:
     await ctx.execute_sql('on_reindex')
+    if path := ctx.config.custom.get('bootstrap_snapshot'):
+        await restore_snapshot(ctx, Path(path))
+    # NOTE: Built back in `on_synchronized`
+    if is_postgres(ctx) and is_enabled(ctx.config.custom.get('defer_indexes')):
+        await defer_indexes(ctx)
@@ -1,11 +1,24 @@
 from dipdup.context import HookContext
 
+from hicdex.cache import HOLDER_CACHE_SIZE, holder_cache
+from hicdex.deferred_indexes import has_deferred_indexes
 from hicdex.metadata_utils import fix_holder_metadata, fix_other_metadata
+from hicdex.sqlite import LOOKUP_INDEXES, apply_pragmas, create_indexes
+from hicdex.utils import is_postgres
 
 
 async def on_restart(
     ctx: HookContext,
 ) -> None:
-    await ctx.execute_sql('on_restart')
+    if is_postgres(ctx):
+        await ctx.execute_sql('on_restart')
+        # NOTE: DipDup has recreated deferred indexes on startup, bring foreign keys back too
+        if await has_deferred_indexes():
+            await ctx.fire_hook('build_deferred_indexes', wait=False)
+    else:
+        await apply_pragmas(ctx)
+        # NOTE: The rest are created in `on_synchronized`
+        await create_indexes(LOOKUP_INDEXES)
+    holder_cache.resize(ctx.config.custom.get('holder_cache_size', HOLDER_CACHE_SIZE))
     await fix_holder_metadata(ctx)
     await fix_other_metadata(ctx)
@@ -1,7 +1,17 @@
 from dipdup.context import HookContext
 
+from hicdex.deferred_indexes import has_deferred_indexes
+from hicdex.sqlite import DEFERRED_INDEXES, create_indexes
+from hicdex.utils import is_postgres
+
 
 async def on_synchronized(
     ctx: HookContext,
 ) -> None:
-    await ctx.execute_sql('on_synchronized')
+    if is_postgres(ctx):
+        # NOTE: Takes hours on a full chain; callback manager runs it in the background, handlers are not blocked
+        if await has_deferred_indexes():
+            await ctx.fire_hook('build_deferred_indexes', wait=False)
+        await ctx.execute_sql('on_synchronized')
+    else:
+        await create_indexes(DEFERRED_INDEXES)
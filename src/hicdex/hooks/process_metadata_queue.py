@@ -0,0 +1,17 @@
+import asyncio
+
+from dipdup.context import HookContext
+
+from hicdex.metadata_queue import QUEUE_POLL_INTERVAL, process_queue
+from hicdex.metrics import Metrics
+
+
+async def process_metadata_queue(
+    ctx: HookContext,
+) -> None:
+    while True:
+        # NOTE: Daemon hook never returns, measure batches instead
+        with Metrics.measure_callback('process_metadata_queue'):
+            processed = await process_queue(ctx)
+        if not processed:
+            await asyncio.sleep(QUEUE_POLL_INTERVAL)
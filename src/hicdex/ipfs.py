@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from dipdup.context import DipDupContext
+from dipdup.utils.database import get_connection
+from tortoise import timezone
+from tortoise.exceptions import BaseORMException
+
+import hicdex.models as models
+from hicdex.metrics import Metrics
+from hicdex.utils import clean_null_bytes
+
+_logger = logging.getLogger(__name__)
+
+# NOTE: In order of preference
+IPFS_DATASOURCES = ('ipfs', 'fallback_ipfs', 'fallback2_ipfs')
+
+IPFS_GATEWAY_CONCURRENCY = 8
+IPFS_HEDGE_DELAY = 2.0
+
+MIN_TIMEOUT = 5.0
+MAX_TIMEOUT = 60.0
+TIMEOUT_PERCENTILE = 0.95
+TIMEOUT_MULTIPLIER = 3.0
+MIN_SAMPLES = 20
+
+IPFS_CACHE_MAX_BYTES = 2 * 1024**3
+# NOTE: Don't bump `accessed_at` on every hit
+IPFS_CACHE_ACCESS_RESOLUTION = timedelta(days=1)
+IPFS_CACHE_PRUNE_BATCH = 1000
+
+_gateway_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+class GatewayLatency:
+    """Rolling window of gateway response times used to pick a request timeout"""
+
+    def __init__(self, window: int = 200) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        return samples[min(int(len(samples) * q), len(samples) - 1)]
+
+    def timeout(self) -> float:
+        if len(self._samples) < MIN_SAMPLES:
+            return MAX_TIMEOUT
+        latency = self.percentile(TIMEOUT_PERCENTILE) or MAX_TIMEOUT
+        return min(max(latency * TIMEOUT_MULTIPLIER, MIN_TIMEOUT), MAX_TIMEOUT)
+
+
+_latencies: Dict[str, GatewayLatency] = {name: GatewayLatency() for name in IPFS_DATASOURCES}
+
+
+def get_gateway_semaphore(ctx: DipDupContext, provider: str) -> asyncio.Semaphore:
+    if provider not in _gateway_semaphores:
+        limit = int(ctx.config.custom.get('ipfs_gateway_concurrency', IPFS_GATEWAY_CONCURRENCY))
+        _gateway_semaphores[provider] = asyncio.Semaphore(limit)
+    return _gateway_semaphores[provider]
+
+
+def get_hedge_delay(ctx: DipDupContext) -> Optional[float]:
+    """Seconds to wait before asking the next gateway, `None` to wait for the previous one to fail"""
+    if not ctx.config.custom.get('ipfs_hedging', True):
+        return None
+    return float(ctx.config.custom.get('ipfs_hedge_delay', IPFS_HEDGE_DELAY))
+
+
+async def call_ipfs(ctx: DipDupContext, provider: str, path: str) -> Optional[Dict[str, Any]]:
+    """Fetch JSON document from a single gateway, `None` if it's missing or invalid"""
+    ipfs_datasource = ctx.get_ipfs_datasource(provider)
+    latency = _latencies.setdefault(provider, GatewayLatency())
+    timeout = latency.timeout()
+
+    waiting_since = time.perf_counter()
+    try:
+        async with get_gateway_semaphore(ctx, provider):
+            started_at = time.perf_counter()
+            try:
+                data = await asyncio.wait_for(ipfs_datasource.get(path), timeout)
+            except asyncio.TimeoutError:
+                _logger.warning(f'{provider} timed out after {timeout:.1f}s')
+                latency.observe(timeout)
+                return None
+            latency.observe(time.perf_counter() - started_at)
+    finally:
+        Metrics.observe_ipfs_wait(provider, time.perf_counter() - waiting_since)
+
+    if data and isinstance(data, dict):
+        return data
+    return None
+
+
+async def fetch_ipfs_json(ctx: DipDupContext, path: str) -> Dict[str, Any]:
+    """Fetch JSON document by CID from all IPFS datasources.
+
+    The next gateway is asked as soon as the previous one fails or after a hedge delay, whichever comes first.
+    The first valid document wins; requests still in flight are cancelled.
+    """
+    path = path.replace('ipfs://', '')
+    providers: List[str] = list(IPFS_DATASOURCES)
+    hedge_delay = get_hedge_delay(ctx)
+    pending: Set[asyncio.Task[Optional[Dict[str, Any]]]] = set()
+
+    try:
+        while providers or pending:
+            if providers:
+                provider = providers.pop(0)
+                _logger.info(f'trying {provider} for {path}')
+                pending.add(asyncio.create_task(call_ipfs(ctx, provider, path), name=provider))
+
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=hedge_delay if providers else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                if exc := task.exception():
+                    _logger.warning(f'error during {task.get_name()} call: {exc}')
+                elif data := task.result():
+                    return data
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    _logger.warning(f'giving up on {path}')
+    return {}
+
+
+def _dump(data: Dict[str, Any]) -> str:
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def _checksum(dump: str) -> str:
+    return hashlib.sha256(dump.encode()).hexdigest()
+
+
+def _clean_null_bytes(data: Any) -> Any:
+    """PostgreSQL `jsonb` rejects `\\u0000` in strings and keys"""
+    if isinstance(data, str):
+        return clean_null_bytes(data)
+    if isinstance(data, dict):
+        return {clean_null_bytes(key): _clean_null_bytes(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_clean_null_bytes(value) for value in data]
+    return data
+
+
+async def get_cached(path: str) -> Optional[Dict[str, Any]]:
+    """Get JSON document from the local content-addressed cache"""
+    cid = path.replace('ipfs://', '')
+    entry = await models.IpfsCache.get_or_none(cid=cid)
+    if entry is None:
+        return None
+
+    if not isinstance(entry.data, dict) or _checksum(_dump(entry.data)) != entry.checksum:
+        _logger.warning(f'dropping corrupted cache entry {cid}')
+        await entry.delete()
+        return None
+
+    now = timezone.now()
+    if now - entry.accessed_at > IPFS_CACHE_ACCESS_RESOLUTION:
+        entry.accessed_at = now
+        await entry.save(update_fields=('accessed_at',))
+    return entry.data
+
+
+async def put_cached(path: str, data: Dict[str, Any]) -> None:
+    """Store JSON document in the local content-addressed cache; content of a CID never changes.
+
+    Null bytes are dropped, like handlers do for fields of the document. Failing to cache never fails the fetch.
+    """
+    if not path.startswith('ipfs://') or not data:
+        return
+
+    data = _clean_null_bytes(data)
+    dump = _dump(data)
+    cid = path.replace('ipfs://', '')
+    entry = models.IpfsCache(
+        cid=cid,
+        data=data,
+        checksum=_checksum(dump),
+        size=len(dump.encode()),
+        accessed_at=timezone.now(),
+    )
+    try:
+        await models.IpfsCache.bulk_create([entry], ignore_conflicts=True)
+    except BaseORMException as e:
+        _logger.warning(f'failed to cache {cid}: {e}')
+
+
+async def prune_cache(ctx: DipDupContext) -> None:
+    """Evict least recently used documents until the cache fits `ipfs_cache_max_bytes`"""
+    max_bytes = int(ctx.config.custom.get('ipfs_cache_max_bytes', IPFS_CACHE_MAX_BYTES))
+    _, rows = await get_connection().execute_query('SELECT SUM(size) AS total FROM ipfs_cache')
+    total: Optional[int] = rows[0]['total']
+    excess = (total or 0) - max_bytes
+    if excess <= 0:
+        return
+
+    _logger.info(f'evicting {excess} bytes from ipfs cache')
+    while excess > 0:
+        entries = (
+            await models.IpfsCache.all()
+            .order_by('accessed_at')
+            .limit(IPFS_CACHE_PRUNE_BATCH)
+            .values_list('cid', 'size')
+        )
+        if not entries:
+            break
+
+        evicted = []
+        for cid, size in entries:
+            if excess <= 0:
+                break
+            evicted.append(cid)
+            excess -= size
+        await models.IpfsCache.filter(cid__in=evicted).delete()
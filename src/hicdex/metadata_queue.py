@@ -0,0 +1,55 @@
+import logging
+
+from dipdup.context import DipDupContext
+
+import hicdex.models as models
+from hicdex.metadata_utils import CidFailures, get_metadata_concurrency, resolve_holder_metadata, resolve_token_metadata
+from hicdex.utils import gather_bounded, iterate
+
+_logger = logging.getLogger(__name__)
+
+QUEUE_BATCH_SIZE = 100
+QUEUE_POLL_INTERVAL = 5
+
+
+async def _enqueue(kind: models.MetadataTaskKind, key: str, level: int) -> None:
+    task = models.MetadataTask(id=f'{kind.value}:{key}', kind=kind, key=key, level=level)
+    # NOTE: Already queued items are left as is. A rollback may drop such item; `fix_missing_metadata` will pick it up.
+    await models.MetadataTask.bulk_create([task], ignore_conflicts=True)
+
+
+async def enqueue_token(token_id: int, level: int) -> None:
+    """Schedule metadata resolution for a token; duplicates are ignored"""
+    await _enqueue(models.MetadataTaskKind.token, str(token_id), level)
+
+
+async def enqueue_holder(address: str, level: int) -> None:
+    """Schedule subjkt metadata resolution for a holder; duplicates are ignored"""
+    await _enqueue(models.MetadataTaskKind.holder, address, level)
+
+
+async def process_queue(ctx: DipDupContext, batch_size: int = QUEUE_BATCH_SIZE) -> int:
+    """Resolve metadata for the oldest queued items, return number of processed ones"""
+    tasks = await models.MetadataTask.all().order_by('created_at').limit(batch_size)
+    if not tasks:
+        return 0
+
+    failures = await CidFailures.load()
+
+    async def _process(task: models.MetadataTask) -> None:
+        if task.kind == models.MetadataTaskKind.token:
+            token = await models.Token.get_or_none(id=int(task.key))
+            if token is not None and not token.artifact_uri and not token.title:
+                await resolve_token_metadata(ctx, failures, token)
+        else:
+            holder = await models.Holder.get_or_none(address=task.key)
+            if holder is not None and holder.metadata_file.startswith('ipfs://'):
+                await resolve_holder_metadata(ctx, failures, holder)
+
+    await gather_bounded(iterate(tasks), _process, get_metadata_concurrency(ctx))
+    await failures.save()
+
+    # NOTE: Failed items are dropped too, `fix_missing_metadata` job retries them after backoff. A rollback of
+    # a level indexed meanwhile could restore them, then they are resolved again.
+    await models.MetadataTask.filter(id__in=[task.id for task in tasks]).delete()
+    return len(tasks)
@@ -1,20 +1,50 @@
 import json
-import asyncio
 import logging
 import os
 from contextlib import suppress
+from datetime import timedelta
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Set
 
 import aiohttp
 from dipdup.context import DipDupContext
-from tortoise.expressions import Q
+from tortoise import timezone
+from tortoise.expressions import Q, Subquery
 
 import hicdex.models as models
-from hicdex.utils import clean_null_bytes, http_request
+from hicdex.cache import holder_cache, tag_cache
+from hicdex.ipfs import fetch_ipfs_json, get_cached, put_cached
+from hicdex.utils import clean_null_bytes, gather_bounded, http_request, insert_unversioned, iterate, update_unversioned
 
 _logger = logging.getLogger(__name__)
 
+METADATA_CONCURRENCY = 16
+METADATA_PAGE_SIZE = 500
+
+# NOTE: Metadata is resolved concurrently with indexing, never overwrite fields updated by handlers. Writes are
+# unversioned, they must survive rollbacks of levels indexed meanwhile.
+TOKEN_METADATA_FIELDS = (
+    'title',
+    'description',
+    'artifact_uri',
+    'display_uri',
+    'thumbnail_uri',
+    'mime',
+    'extra',
+    'rights',
+    'right_uri',
+    'formats',
+    'language',
+    'attributes',
+    'content_rating',
+    'accessibility',
+)
+HOLDER_METADATA_FIELDS = ('metadata', 'description')
+
+RETRY_DELAY = timedelta(minutes=10)
+MAX_RETRY_DELAY = timedelta(days=7)
+
 
 async def fix_token_metadata(ctx: DipDupContext, token: models.Token) -> bool:
     metadata = await get_metadata(ctx, token)
@@ -41,7 +71,7 @@ async def fix_token_metadata(ctx: DipDupContext, token: models.Token) -> bool:
     token.content_rating = get_content_rating(metadata)
     token.accessibility = metadata.get('accessibility', {})
     await add_tags(token, metadata)
-    await token.save()
+    await update_unversioned(token, TOKEN_METADATA_FIELDS)
     return metadata != {}
 
 
@@ -57,63 +87,211 @@ async def fix_subjkt_metadata(ctx: DipDupContext, holder: models.Holder) -> bool
     holder.metadata = metadata
     holder.description = metadata.get('description', {})
 
-    await holder.save()
+    await update_unversioned(holder, HOLDER_METADATA_FIELDS)
+    holder_cache.update(holder, HOLDER_METADATA_FIELDS)
     return metadata != {}
 
 
+class CidFailures:
+    """Failed CIDs loaded in bulk once per run; failing ones are retried with exponential backoff"""
+
+    def __init__(self, attempts: Dict[str, int], blocked: Set[str]) -> None:
+        self._attempts = attempts
+        self._blocked = blocked
+        self._failed: Dict[str, str] = {}
+        self._recovered: Set[str] = set()
+
+    @classmethod
+    async def load(cls) -> 'CidFailures':
+        now = timezone.now()
+        attempts, blocked = {}, set()
+        for cid, attempt, retry_at in await models.CidFailure.all().values_list('cid', 'attempts', 'retry_at'):
+            attempts[cid] = attempt
+            if retry_at > now:
+                blocked.add(cid)
+        return cls(attempts, blocked)
+
+    def is_blocked(self, cid: str) -> bool:
+        return cid in self._blocked
+
+    def fail(self, cid: str, error: str) -> None:
+        self._failed[cid] = error
+
+    def succeed(self, cid: str) -> None:
+        if cid in self._attempts:
+            self._recovered.add(cid)
+
+    async def save(self) -> None:
+        now = timezone.now()
+        if self._failed:
+            failures = []
+            for cid, error in self._failed.items():
+                attempts = self._attempts.get(cid, 0) + 1
+                failures.append(
+                    models.CidFailure(
+                        cid=cid,
+                        attempts=attempts,
+                        last_error=error,
+                        retry_at=now + get_retry_delay(attempts),
+                    )
+                )
+            # NOTE: Tortoise 0.19 renders `ON CONFLICT` twice for models without generated fields, so no upsert here
+            await models.CidFailure.filter(cid__in=self._failed).delete()
+            await models.CidFailure.bulk_create(failures, ignore_conflicts=True)
+        if self._recovered:
+            await models.CidFailure.filter(cid__in=self._recovered).delete()
+
+        for cid in self._failed:
+            self._attempts[cid] = self._attempts.get(cid, 0) + 1
+        for cid in self._recovered:
+            self._attempts.pop(cid, None)
+        self._failed, self._recovered = {}, set()
+
+
+def get_retry_delay(attempts: int) -> timedelta:
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+async def resolve_token_metadata(ctx: DipDupContext, failures: CidFailures, token: models.Token) -> None:
+    if failures.is_blocked(token.metadata):
+        _logger.warning(f'ignoring {token.metadata} for token {token.id}')
+        return
+
+    try:
+        fixed = await fix_token_metadata(ctx, token)
+    except Exception as e:
+        _logger.warning(f'failed to fix metadata for {token.id}: {e}')
+        failures.fail(token.metadata, repr(e))
+        return
+
+    if fixed:
+        _logger.info(f'fixed metadata for {token.id}')
+        failures.succeed(token.metadata)
+    else:
+        _logger.warning(f'failed to fix metadata for {token.id}')
+        failures.fail(token.metadata, 'metadata not found')
+
+
+async def resolve_holder_metadata(ctx: DipDupContext, failures: CidFailures, holder: models.Holder) -> None:
+    if failures.is_blocked(holder.metadata_file):
+        _logger.warning(f'ignoring {holder.metadata_file} for holder {holder.address}')
+        return
+
+    try:
+        fixed = await fix_subjkt_metadata(ctx, holder)
+    except Exception as e:
+        _logger.warning(f'failed to fix metadata for {holder.address}: {e}')
+        failures.fail(holder.metadata_file, repr(e))
+        return
+
+    if fixed:
+        _logger.info(f'fixed metadata for {holder.address}')
+        failures.succeed(holder.metadata_file)
+    else:
+        _logger.warning(f'failed to fix metadata for {holder.address}')
+        failures.fail(holder.metadata_file, 'metadata not found')
+
+
+def missing_token_metadata() -> Q:
+    # NOTE: Keep in sync with partial indexes in `sql/on_restart/01_metadata_indexes.sql`
+    return Q(artifact_uri='') | Q(rights__isnull=True)
+
+
+def missing_holder_metadata() -> Q:
+    return ~Q(metadata_file='') & Q(metadata='{}')
+
+
+def due_cids() -> Subquery:
+    return Subquery(models.CidFailure.filter(retry_at__lte=timezone.now()).values('cid'))
+
+
+def blocked_cids() -> Subquery:
+    return Subquery(models.CidFailure.filter(retry_at__gt=timezone.now()).values('cid'))
+
+
 async def fix_other_metadata(ctx: DipDupContext) -> None:
+    """Resolve metadata of tokens minted since the last run, then of tokens whose CIDs are due for retry.
+
+    New tokens are paged from a persistent high-water mark; every token below it either has metadata or a
+    `CidFailure` row, so the run never scans the whole table.
+    """
     _logger.info(f'running fix_missing_metadata job')
-    async for token in models.Token.filter(Q(artifact_uri='') | Q(rights__isnull=True)).order_by('-id'):
-        if await models.IgnoredCids.get_or_none(cid=token.metadata) is None:
-            fixed = await fix_token_metadata(ctx, token)
-            if fixed:
-                _logger.info(f'fixed metadata for {token.id}')
-            else:
-                _logger.warning(f'failed to fix metadata for {token.id}')
-                # insert into ignored_cids path
-                await models.IgnoredCids.create(cid=token.metadata)
-        else:
-            _logger.warning(f'ignoring {token.metadata} for token {token.id}')
+    failures = await CidFailures.load()
+    await insert_unversioned(models.MetadataCursor, [models.MetadataCursor(name='token', value=-1)])
+    cursor = await models.MetadataCursor.get(name='token')
+    callback = partial(resolve_token_metadata, ctx, failures)
+    concurrency = get_metadata_concurrency(ctx)
+
+    async for page in paginate_tokens(missing_token_metadata() & Q(id__gt=cursor.value)):
+        await gather_bounded(iterate(page), callback, concurrency)
+        await failures.save()
+        cursor.value = page[-1].id
+        await update_unversioned(cursor, ('value', 'updated_at'))
+
+    async for page in paginate_tokens(missing_token_metadata() & Q(id__lte=cursor.value, metadata__in=due_cids())):
+        await gather_bounded(iterate(page), callback, concurrency)
+        await failures.save()
 
 
 async def fix_holder_metadata(ctx: DipDupContext) -> None:
-    async for holder in models.Holder.filter(~Q(metadata_file='') & Q(metadata='{}')):
-        if await models.IgnoredCids.get_or_none(cid=holder.metadata_file) is None:
-            fixed = await fix_subjkt_metadata(ctx, holder)
-            if fixed:
-                _logger.info(f'fixed metadata for {holder.address}')
-            else:
-                _logger.warning(f'failed to fix metadata for {holder.address}')
-                # insert into ignored_cids path
-                await models.IgnoredCids.create(cid=holder.metadata_file)
-        else:
-            _logger.warning(f'ignoring {holder.metadata_file} for holder {holder.address}')
+    # NOTE: Holders have no monotonic key; candidates are few and CIDs waiting for retry are skipped in SQL
+    failures = await CidFailures.load()
+    callback = partial(resolve_holder_metadata, ctx, failures)
+    concurrency = get_metadata_concurrency(ctx)
+    query = missing_holder_metadata() & ~Q(metadata_file__in=blocked_cids())
 
+    last_address = ''
+    while True:
+        page = await models.Holder.filter(query, address__gt=last_address).order_by('address').limit(METADATA_PAGE_SIZE)
+        if not page:
+            break
+        await gather_bounded(iterate(page), callback, concurrency)
+        await failures.save()
+        last_address = page[-1].address
 
-async def add_tags(token: models.Token, metadata: Dict[str, Any]) -> None:
-    tags = [await get_or_create_tag(tag) for tag in get_tags(metadata)]
-    for tag in tags:
-        token_tag = await models.TokenTag(token=token, tag=tag)
-        await token_tag.save()
 
+async def paginate_tokens(query: Q) -> AsyncIterator[List[models.Token]]:
+    """Keyset pagination by token id"""
+    last_id = -1
+    while True:
+        page = await models.Token.filter(query, id__gt=last_id).order_by('id').limit(METADATA_PAGE_SIZE)
+        if not page:
+            return
+        yield page
+        last_id = page[-1].id
 
-async def get_or_create_tag(tag: str) -> models.TagModel:
-    tag_model, _ = await models.TagModel.get_or_create(tag=tag)
-    return tag_model
+
+def get_metadata_concurrency(ctx: DipDupContext) -> int:
+    return int(ctx.config.custom.get('metadata_concurrency', METADATA_CONCURRENCY))
+
+
+async def add_tags(token: models.Token, metadata: Dict[str, Any]) -> None:
+    tag_ids = await tag_cache.get_ids(get_tags(metadata))
+    if not tag_ids:
+        return
+    token_tags = [models.TokenTag(token_id=token.id, tag_id=tag_id) for tag_id in tag_ids.values()]
+    # NOTE: Unique on (token, tag), metadata can be fixed more than once
+    await insert_unversioned(models.TokenTag, token_tags)
 
 
 async def get_metadata(ctx: DipDupContext, token: models.Token) -> Dict[str, Any]:
+    if token.metadata.startswith('ipfs://') and (cached := await get_cached(token.metadata)) is not None:
+        _logger.info(f'found metadata for {token.id} in cache')
+        return cached
+
     # FIXME: hard coded contract
     metadata_datasource = ctx.get_metadata_datasource('metadata')
     try:
         metadata = await metadata_datasource.get_token_metadata('KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton', token.id)
         if metadata is not None:
             _logger.info(f'found metadata for {token.id} from metadata_datasource')
+            if isinstance(metadata, dict):
+                await put_cached(token.metadata, metadata)
             return metadata
     except Exception as e:
         _logger.warning(f'error during api-metadata calls: {e}')
 
-    data = await fetch_metadata_ipfs(ctx, token.metadata)
+    data = await fetch_metadata_ipfs(ctx, token.metadata, use_cache=False)
     if data != {}:
         _logger.info(f'found metadata for {token.id} from IPFS')
     else:
@@ -121,39 +299,15 @@ async def get_metadata(ctx: DipDupContext, token: models.Token) -> Dict[str, Any
     return data
 
 
-async def call_ipfs(ctx: DipDupContext, provider: str, path: str) -> Dict[str, Any]:
-    ipfs_datasource = ctx.get_ipfs_datasource(provider)
-    try:
-        coro = ipfs_datasource.get(path.replace('ipfs://', ''))
-        data = await asyncio.wait_for(coro, 60)
-    except asyncio.TimeoutError:
-        data = None
-    if data and not isinstance(data, list):
-        return data
-    return {}
-
-
-async def fetch_metadata_ipfs(ctx: DipDupContext, path: str) -> Dict[str, Any]:
+async def fetch_metadata_ipfs(ctx: DipDupContext, path: str, use_cache: bool = True) -> Dict[str, Any]:
     if not path.startswith('ipfs://'):
         return {}
+    if use_cache and (cached := await get_cached(path)) is not None:
+        return cached
 
-    try:
-        _logger.info(f'trying main ipfs url')
-        return await call_ipfs(ctx, 'ipfs', path.replace('ipfs://', ''))
-    except Exception as e:
-        _logger.warning(f'error during ipfs call: {e}')
-        try:
-            _logger.info(f'trying fallback ipfs url')
-            return await call_ipfs(ctx, 'fallback_ipfs', path.replace('ipfs://', ''))
-        except Exception as e:
-            _logger.warning(f'fallback also borked: {e}')
-            try:
-                _logger.warning(f'last one')
-                return await call_ipfs(ctx, 'fallback2_ipfs', path.replace('ipfs://', ''))
-            except Exception as e:
-                _logger.warning(f'giving up')
-
-    return {}
+    data = await fetch_ipfs_json(ctx, path)
+    await put_cached(path, data)
+    return data
 
 
 def get_mime(metadata: Dict[str, Any]) -> str:
@@ -0,0 +1,185 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Awaitable, Callable, Iterator, NoReturn, Optional, TypeVar, cast
+
+from dipdup.config import OperationHandlerOriginationPatternConfig as OriginationPatternConfig
+from dipdup.config import OperationHandlerTransactionPatternConfig as TransactionPatternConfig
+from dipdup.context import DipDupContext, HandlerContext
+from dipdup.prometheus import Metrics as DipDupMetrics
+from prometheus_client import Counter, Gauge, Histogram
+
+CallbackT = TypeVar('CallbackT', bound=Callable[..., Awaitable[None]])
+
+CALLBACK_LABELS = ('callback', 'contract')
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+# NOTE: Registered in the default registry, served by DipDup's Prometheus endpoint when enabled
+_holder_cache_hits = Counter(
+    'hicdex_holder_cache_hits_total',
+    'Number of holders found in cache',
+)
+_holder_cache_misses = Counter(
+    'hicdex_holder_cache_misses_total',
+    'Number of holders missing in cache',
+)
+_holder_cache_size = Gauge(
+    'hicdex_holder_cache_size',
+    'Number of holders in cache',
+)
+_callback_duration = Histogram(
+    'hicdex_callback_duration_seconds',
+    'Time spent in handler and hook callbacks',
+    CALLBACK_LABELS,
+)
+_callback_queries = Counter(
+    'hicdex_callback_queries_total',
+    'Number of database queries issued by callbacks',
+    CALLBACK_LABELS,
+)
+_callback_rows_written = Counter(
+    'hicdex_callback_rows_written_total',
+    'Number of rows inserted, updated or deleted by callbacks; filtered updates and deletes count as one',
+    CALLBACK_LABELS,
+)
+_callback_ipfs_wait = Histogram(
+    'hicdex_callback_ipfs_wait_seconds',
+    'Time callbacks spent waiting for IPFS gateways, including concurrency limit',
+    (*CALLBACK_LABELS, 'provider'),
+)
+
+
+@dataclass
+class _CallbackStats:
+    callback: str
+    contract: str
+    queries: int = 0
+    rows_written: int = 0
+
+
+_callback_stats: ContextVar[Optional[_CallbackStats]] = ContextVar('callback_stats', default=None)
+
+
+class _QueryObserver(logging.Handler):
+    """Attribute queries logged by Tortoise to the callback running in the current task.
+
+    Records at or above `forward_level` are passed to handlers of parent loggers, like a propagating logger does.
+    """
+
+    def __init__(self, logger: logging.Logger, forward_level: Optional[int]) -> None:
+        super().__init__()
+        self._logger = logger
+        self._forward_level = forward_level
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._observe(record)
+        if self._forward_level is not None and record.levelno >= self._forward_level and self._logger.parent:
+            self._logger.parent.callHandlers(record)
+
+    def _observe(self, record: logging.LogRecord) -> None:
+        stats = _callback_stats.get()
+        if stats is None:
+            return
+
+        stats.queries += 1
+        args = record.args if isinstance(record.args, tuple) else ()
+        query = str(args[0]) if args else record.getMessage()
+        if not query.lstrip()[:6].upper().startswith(WRITE_STATEMENTS):
+            return
+        values = args[1] if len(args) > 1 else None
+        # NOTE: `execute_many` logs a list of rows
+        if values and isinstance(values, list) and isinstance(values[0], (list, tuple)):
+            stats.rows_written += len(values)
+        else:
+            stats.rows_written += 1
+
+
+_query_observer: Optional[_QueryObserver] = None
+
+
+def _observe_queries() -> None:
+    global _query_observer
+    if _query_observer is not None:
+        return
+
+    logger = logging.getLogger('tortoise.db_client')
+    forward_level = None
+    if not logger.isEnabledFor(logging.DEBUG):
+        # NOTE: Queries are logged with DEBUG level. To count them the logger is switched to DEBUG, but only records
+        # passing the configured level reach other handlers, so log output stays the same.
+        if logger.propagate:
+            forward_level = logger.getEffectiveLevel()
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+    _query_observer = _QueryObserver(logger, forward_level)
+    logger.addHandler(_query_observer)
+
+
+def _get_contract(ctx: DipDupContext) -> str:
+    if not isinstance(ctx, HandlerContext):
+        return ''
+    pattern = getattr(ctx.handler_config, 'pattern', ())
+    if not pattern:
+        return ''
+    if isinstance(pattern[0], TransactionPatternConfig) and pattern[0].destination:
+        return pattern[0].destination.name
+    if isinstance(pattern[0], OriginationPatternConfig) and pattern[0].originated_contract:
+        return pattern[0].originated_contract.name
+    return ''
+
+
+class Metrics:
+    def __call__(cls) -> NoReturn:
+        raise TypeError('Metrics is a singleton')
+
+    @classmethod
+    def set_holder_cache_hit(cls) -> None:
+        _holder_cache_hits.inc()
+
+    @classmethod
+    def set_holder_cache_miss(cls) -> None:
+        _holder_cache_misses.inc()
+
+    @classmethod
+    def set_holder_cache_size(cls, size: int) -> None:
+        _holder_cache_size.set(size)
+
+    @classmethod
+    @contextmanager
+    def measure_callback(cls, callback: str, contract: str = '') -> Iterator[None]:
+        """Report duration, queries and rows written by the code inside, labeled by callback and contract"""
+        if not DipDupMetrics.enabled:
+            yield
+            return
+
+        _observe_queries()
+        stats = _CallbackStats(callback, contract)
+        token = _callback_stats.set(stats)
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            _callback_stats.reset(token)
+            _callback_duration.labels(callback, contract).observe(time.perf_counter() - started_at)
+            _callback_queries.labels(callback, contract).inc(stats.queries)
+            _callback_rows_written.labels(callback, contract).inc(stats.rows_written)
+
+    @classmethod
+    def observe_ipfs_wait(cls, provider: str, seconds: float) -> None:
+        stats = _callback_stats.get()
+        callback, contract = (stats.callback, stats.contract) if stats else ('', '')
+        _callback_ipfs_wait.labels(callback, contract, provider).observe(seconds)
+
+
+def instrumented(fn: CallbackT) -> CallbackT:
+    """Measure a handler or hook callback with `Metrics.measure_callback`"""
+
+    @wraps(fn)
+    async def wrapper(ctx: DipDupContext, *args: Any, **kwargs: Any) -> None:
+        with Metrics.measure_callback(fn.__name__, _get_contract(ctx)):
+            await fn(ctx, *args, **kwargs)
+
+    return cast(CallbackT, wrapper)
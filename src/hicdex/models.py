@@ -1,5 +1,6 @@
 from datetime import datetime
 from enum import Enum, IntEnum
+from typing import Optional
 
 from dipdup.models import Model
 from tortoise import ForeignKeyFieldInstance, fields
@@ -17,6 +18,11 @@ class ShareholderStatus(str, Enum):
     benefactor = 'benefactor'
 
 
+class MetadataTaskKind(str, Enum):
+    token = 'token'
+    holder = 'holder'
+
+
 class FA2(Model):
     contract = fields.CharField(36, pk=True)
 
@@ -30,11 +36,22 @@ class Holder(Model):
     hdao_balance = fields.BigIntField(default=0)
     is_split = fields.BooleanField(default=False)
 
+    tokens_created = fields.BigIntField(default=0)
+    tokens_held = fields.BigIntField(default=0)
+    sales_volume = fields.BigIntField(default=0)
+    purchase_volume = fields.BigIntField(default=0)
+    first_active_level = fields.BigIntField(null=True)
+    last_active_level = fields.BigIntField(null=True)
+
 
 class SplitContract(Model):
     contract: ForeignKeyFieldInstance[Holder] = fields.ForeignKeyField('models.Holder', 'shares', index=True)
     administrator = fields.CharField(36, null=True)
     total_shares = fields.BigIntField(null=True)
+    signatures_required = fields.BigIntField(default=0)
+
+    id: int
+    contract_id: str
 
 
 class Shareholder(Model):
@@ -63,6 +80,7 @@ class Token(Model):
     supply = fields.SmallIntField(default=0)
     hdao_balance = fields.BigIntField(default=0)
     is_signed = fields.BooleanField(default=False)
+    signatures_collected = fields.BigIntField(default=0)
 
     level = fields.BigIntField(default=0)
     timestamp = fields.DatetimeField(auto_now=True)
@@ -78,6 +96,9 @@ class Token(Model):
     accessibility = fields.JSONField(default={})
     content_rating = fields.TextField(default='')
 
+    # NOTE: Lowest price among active valid swaps
+    floor_price: Optional[int] = fields.BigIntField(null=True)
+
 
 class TokenOperator(Model):
     token: ForeignKeyFieldInstance[Token] = fields.ForeignKeyField('models.Token', 'operators', null=False, index=True)
@@ -87,11 +108,12 @@ class TokenOperator(Model):
 
     class Meta:
         table = 'token_operator'
+        unique_together = (('token', 'owner', 'operator'),)
 
 
 class TagModel(Model):
     id = fields.BigIntField(pk=True)
-    tag = fields.CharField(255)
+    tag = fields.CharField(255, unique=True)
 
 
 class TokenTag(Model):
@@ -100,8 +122,12 @@ class TokenTag(Model):
         'models.TagModel', 'tag_tokens', null=False, index=True
     )
 
+    token_id: int
+    tag_id: int
+
     class Meta:
         table = 'token_tag'
+        unique_together = (('token', 'tag'),)
 
 
 class TokenHolder(Model):
@@ -113,8 +139,12 @@ class TokenHolder(Model):
     )
     quantity = fields.BigIntField(default=0)
 
+    holder_id: str
+    token_id: int
+
     class Meta:
         table = 'token_holder'
+        unique_together = (('token', 'holder'),)
 
 
 class Signatures(Model):
@@ -151,6 +181,9 @@ class Swap(Model):
     level = fields.BigIntField()
     timestamp = fields.DatetimeField()
 
+    creator_id: str
+    token_id: int
+
 
 class Trade(Model):
     id = fields.BigIntField(pk=True)
@@ -164,6 +197,99 @@ class Trade(Model):
     level = fields.BigIntField()
     timestamp = fields.DatetimeField()
 
+    token_id: int
+    swap_id: int
+    seller_id: str
+    buyer_id: str
+
+
+class TokenStats(Model):
+    token_id = fields.BigIntField(pk=True, generated=False)
+    trade_count = fields.BigIntField(default=0)
+    volume = fields.BigIntField(default=0)
+    last_sale_price = fields.BigIntField(null=True)
+    last_sale_level = fields.BigIntField(null=True)
+    last_sale_timestamp = fields.DatetimeField(null=True)
+
+    class Meta:
+        table = 'token_stats'
+
+
+class CreatorStats(Model):
+    creator_id = fields.CharField(36, pk=True)
+    trade_count = fields.BigIntField(default=0)
+    volume = fields.BigIntField(default=0)
+    last_sale_price = fields.BigIntField(null=True)
+    last_sale_level = fields.BigIntField(null=True)
+    last_sale_timestamp = fields.DatetimeField(null=True)
+    floor_price: Optional[int] = fields.BigIntField(null=True)
+
+    class Meta:
+        table = 'creator_stats'
+
+
+class DailyStats(Model):
+    day = fields.DateField(pk=True)
+    trade_count = fields.BigIntField(default=0)
+    volume = fields.BigIntField(default=0)
+
+    class Meta:
+        table = 'daily_stats'
+
 
+# NOTE: Superseded by `CidFailure`, rows are moved there on restart
 class IgnoredCids(Model):
     cid = fields.CharField(53, pk=True)
+
+
+class CidFailure(Model):
+    cid = fields.CharField(255, pk=True)
+    attempts = fields.IntField(default=0)
+    last_error = fields.TextField(default='')
+    retry_at = fields.DatetimeField()
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = 'cid_failure'
+
+
+class IpfsCache(Model):
+    cid = fields.CharField(255, pk=True)
+    data = fields.JSONField()
+    checksum = fields.CharField(64)
+    size = fields.IntField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+    accessed_at = fields.DatetimeField()
+
+    class Meta:
+        table = 'ipfs_cache'
+
+
+class MetadataCursor(Model):
+    name = fields.CharField(32, pk=True)
+    value = fields.BigIntField(default=0)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = 'metadata_cursor'
+
+
+class MetadataTask(Model):
+    id = fields.CharField(64, pk=True)
+    kind = fields.CharEnumField(MetadataTaskKind)
+    key = fields.CharField(36)
+    level = fields.BigIntField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = 'metadata_queue'
+
+
+class DeferredIndex(Model):
+    name = fields.CharField(63, pk=True)
+    table_name = fields.CharField(63)
+    definition = fields.TextField()
+    is_constraint = fields.BooleanField(default=False)
+
+    class Meta:
+        table = 'deferred_index'
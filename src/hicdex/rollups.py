@@ -0,0 +1,104 @@
+from typing import List, Optional, Union, cast
+
+import hicdex.models as models
+from hicdex.unit_of_work import UnitOfWork
+
+Rollup = Union[models.TokenStats, models.CreatorStats]
+
+
+async def record_trade(uow: UnitOfWork, swap: models.Swap, trade: models.Trade) -> None:
+    """Account a trade in token, creator and daily rollups"""
+    token = await uow.get_token(swap.token_id)
+    value = swap.price * trade.amount
+
+    rollups: List[Rollup] = [await uow.get_rollup(models.TokenStats, token.id)]
+    if token.creator_id is not None:
+        rollups.append(await uow.get_rollup(models.CreatorStats, token.creator_id))
+    for stats in rollups:
+        stats.trade_count += 1
+        stats.volume += value
+        stats.last_sale_price = swap.price
+        stats.last_sale_level = trade.level
+        stats.last_sale_timestamp = trade.timestamp
+
+    daily = await uow.get_rollup(models.DailyStats, trade.timestamp.date())
+    daily.trade_count += 1
+    daily.volume += value
+
+    seller = await uow.get_holder(trade.seller_id)
+    seller.sales_volume += value
+    touch_holder(seller, trade.level)
+    buyer = await uow.get_holder(trade.buyer_id)
+    buyer.purchase_volume += value
+    touch_holder(buyer, trade.level)
+
+
+def update_holding(holder: models.Holder, holding: models.TokenHolder, amount: int) -> None:
+    """Change token quantity of a holder, counting tokens held with nonzero quantity"""
+    count_holding(holder, holding.quantity, holding.quantity + amount)
+    holding.quantity += amount
+
+
+def count_holding(holder: models.Holder, old_quantity: int, new_quantity: int) -> None:
+    """Count tokens held with nonzero quantity after quantity of one of them has changed"""
+    if (old_quantity > 0) != (new_quantity > 0):
+        holder.tokens_held += 1 if new_quantity > 0 else -1
+
+
+def touch_holder(holder: models.Holder, level: int) -> None:
+    if holder.first_active_level is None:
+        holder.first_active_level = level
+    holder.last_active_level = level
+
+
+async def add_listing(uow: UnitOfWork, swap: models.Swap, token: models.Token) -> None:
+    """Lower floor prices if the new swap is cheaper"""
+    if not swap.is_valid:
+        return
+
+    uow.track(token)
+    price = int(swap.price)
+    if token.floor_price is None or price < token.floor_price:
+        token.floor_price = price
+
+    if token.creator_id is None:
+        return
+    creator_stats = await uow.get_rollup(models.CreatorStats, token.creator_id)
+    if creator_stats.floor_price is None or price < creator_stats.floor_price:
+        creator_stats.floor_price = price
+
+
+async def remove_listing(uow: UnitOfWork, swap: models.Swap) -> None:
+    """Recalculate floor prices the swap has been holding; call once it's no longer active"""
+    if not swap.is_valid:
+        return
+
+    token = await uow.get_token(swap.token_id)
+    if token.floor_price != swap.price:
+        return
+    # NOTE: Removed swap may be still active in the database until `UnitOfWork` is flushed
+    token.floor_price = cast(
+        Optional[int],
+        await models.Swap.filter(token_id=token.id, status=models.SwapStatus.ACTIVE, is_valid=True)
+        .exclude(opid=swap.opid)
+        .order_by('price')
+        .first()
+        .values_list('price', flat=True),
+    )
+
+    if token.creator_id is None:
+        return
+    creator_stats = await uow.get_rollup(models.CreatorStats, token.creator_id)
+    if creator_stats.floor_price != swap.price:
+        return
+    # NOTE: Same for the floor price of this token
+    other_floor_price = cast(
+        Optional[int],
+        await models.Token.filter(creator_id=token.creator_id, floor_price__not_isnull=True)
+        .exclude(id=token.id)
+        .order_by('floor_price')
+        .first()
+        .values_list('floor_price', flat=True),
+    )
+    floor_prices = [price for price in (other_floor_price, token.floor_price) if price is not None]
+    creator_stats.floor_price = min(floor_prices) if floor_prices else None
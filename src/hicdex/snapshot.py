@@ -0,0 +1,134 @@
+import gzip
+import logging
+import re
+from io import BufferedIOBase
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+
+from dipdup.context import DipDupContext
+from dipdup.exceptions import DatabaseEngineError
+from dipdup.utils.database import get_connection, get_schema_hash
+
+from hicdex.utils import is_postgres
+
+_logger = logging.getLogger(__name__)
+
+SNAPSHOT_CHUNK_SIZE = 1024 * 1024
+SCHEMA_TABLE = 'dipdup_schema'
+
+_COPY_PATTERN = re.compile(r'^COPY (?:"?\w+"?\.)?"?(\w+)"? \((.*)\) FROM stdin;$')
+_COPY_END = b'\\.\n'
+_SETVAL_PREFIX = b'SELECT pg_catalog.setval('
+
+
+def open_snapshot(path: Path) -> BufferedIOBase:
+    """Open plain-text `pg_dump` output, compressed or not"""
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rb')
+    return path.open('rb')
+
+
+def parse_copy(line: bytes) -> Optional[Tuple[str, List[str]]]:
+    """Get table name and columns from `COPY ... FROM stdin;` line"""
+    if not line.startswith(b'COPY '):
+        return None
+    if (match := _COPY_PATTERN.match(line.decode().rstrip('\n'))) is None:
+        return None
+    return match.group(1), [column.strip().strip('"') for column in match.group(2).split(',')]
+
+
+def read_schema_hash(path: Path, schema_name: str) -> Optional[str]:
+    """Find the hash DipDup stored for the schema when the snapshot was made"""
+    with open_snapshot(path) as file:
+        for line in file:
+            if (copy := parse_copy(line)) is None or copy[0] != SCHEMA_TABLE:
+                continue
+            for row in file:
+                if row == _COPY_END:
+                    return None
+                schema = dict(zip(copy[1], row.decode().rstrip('\n').split('\t')))
+                if schema.get('name') == schema_name:
+                    return schema.get('hash')
+    return None
+
+
+async def _read_copy(file: BufferedIOBase) -> AsyncIterator[bytes]:
+    chunk: List[bytes] = []
+    size = 0
+    for line in file:
+        if line == _COPY_END:
+            break
+        chunk.append(line)
+        size += len(line)
+        if size >= SNAPSHOT_CHUNK_SIZE:
+            yield b''.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield b''.join(chunk)
+
+
+def _skip_copy(file: BufferedIOBase) -> None:
+    for line in file:
+        if line == _COPY_END:
+            return
+
+
+async def restore_snapshot(ctx: DipDupContext, path: Path) -> None:
+    """Load data from a `pg_dump` snapshot into freshly created tables.
+
+    Snapshot must be made with the same models; its schema hash is checked before anything is loaded, on mismatch
+    nothing is restored and indexing starts from scratch. Table
+    definitions in the snapshot are ignored, only `COPY` data and sequence values are used. Index levels are
+    restored from `dipdup_index`, so indexing continues from the snapshot. Immune tables having data are kept.
+    """
+    if not is_postgres(ctx):
+        raise DatabaseEngineError(msg='Restoring snapshots is not supported', kind='sqlite', required='postgres')
+
+    conn = get_connection()
+    expected_hash = get_schema_hash(conn)
+    snapshot_hash = read_schema_hash(path, ctx.config.schema_name)
+    if snapshot_hash != expected_hash:
+        # NOTE: `BOOTSTRAP_SNAPSHOT` stays set after models are changed; don't fail every following reindex
+        _logger.warning(
+            'Snapshot `%s` is incompatible with current models: schema hash is `%s`, expected `%s`; skipping',
+            path,
+            snapshot_hash,
+            expected_hash,
+        )
+        return
+
+    _logger.info('Restoring snapshot `%s`', path)
+    immune_tables = set(ctx.config.database.immune_tables)
+    async with conn.acquire_connection() as raw_conn:
+        async with raw_conn.transaction():
+            # NOTE: Tables are dumped in alphabetical order; skip foreign key checks. Requires superuser.
+            await raw_conn.execute('SET LOCAL session_replication_role = replica')
+
+            with open_snapshot(path) as file:
+                for line in file:
+                    if line.startswith(_SETVAL_PREFIX):
+                        await raw_conn.execute(line.decode())
+                        continue
+                    if (copy := parse_copy(line)) is None:
+                        continue
+
+                    table, columns = copy
+                    if table == SCHEMA_TABLE:
+                        _skip_copy(file)
+                        continue
+                    if table in immune_tables and await raw_conn.fetchval(f'SELECT EXISTS (SELECT 1 FROM {table})'):
+                        _logger.info('Immune table `%s` is not empty, skipping', table)
+                        _skip_copy(file)
+                        continue
+
+                    result = await raw_conn.copy_to_table(
+                        table,
+                        source=_read_copy(file),
+                        columns=columns,
+                        schema_name=ctx.config.schema_name,
+                        format='text',
+                    )
+                    _logger.info('Restored `%s`: %s', table, result)
+
+            for name, level in await raw_conn.fetch('SELECT name, level FROM dipdup_index ORDER BY name'):
+                _logger.info('Index `%s` restored at level %s', name, level)
@@ -0,0 +1,6 @@
+-- Move CIDs ignored forever to `cid_failure` so they are retried with backoff
+INSERT INTO cid_failure (cid, attempts, last_error, retry_at, updated_at)
+SELECT cid, 1, 'ignored', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP FROM ignored_cids
+ON CONFLICT DO NOTHING;
+
+DELETE FROM ignored_cids;
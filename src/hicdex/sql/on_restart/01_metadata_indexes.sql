@@ -0,0 +1,9 @@
+-- Partial indexes on rows waiting for metadata, used by `fix_missing_metadata` job
+CREATE INDEX IF NOT EXISTS token_missing_metadata_id_idx ON token (id)
+WHERE artifact_uri = '' OR rights IS NULL;
+
+CREATE INDEX IF NOT EXISTS token_missing_metadata_cid_idx ON token (metadata)
+WHERE artifact_uri = '' OR rights IS NULL;
+
+CREATE INDEX IF NOT EXISTS holder_missing_metadata_idx ON holder (address)
+WHERE metadata_file <> '' AND metadata = '{{}}';
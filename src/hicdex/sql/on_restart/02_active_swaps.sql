@@ -0,0 +1,6 @@
+-- Active listings: floor price of a token is the first entry
+CREATE INDEX IF NOT EXISTS swap_active_token_price_idx ON swap (token_id, price)
+WHERE status = 0 AND is_valid;
+
+CREATE INDEX IF NOT EXISTS token_creator_floor_price_idx ON token (creator_id, floor_price)
+WHERE floor_price IS NOT NULL;
@@ -0,0 +1,4 @@
+-- Level ranges read by `export_tables` hook
+CREATE INDEX IF NOT EXISTS token_level_idx ON token (level);
+CREATE INDEX IF NOT EXISTS swap_level_idx ON swap (level);
+CREATE INDEX IF NOT EXISTS trade_level_idx ON trade (level);
@@ -0,0 +1,6 @@
+-- Lookups made by handlers for every operation; check plans with `python -m hicdex.benchmark --explain`
+-- `on_collect*` and `on_cancel_swap*` find swaps by marketplace counter
+CREATE INDEX IF NOT EXISTS swap_contract_id_idx ON swap (contract_address, id);
+
+-- `process_metadata_queue` takes the oldest tasks first
+CREATE INDEX IF NOT EXISTS metadata_queue_created_at_idx ON metadata_queue (created_at);
@@ -0,0 +1,86 @@
+-- Reconcile marketplace rollups with `trade` and `swap`; handlers keep them up to date while indexing
+UPDATE token SET floor_price = listing.price
+FROM (
+    SELECT t.id, MIN(swap.price) AS price
+    FROM token t
+    LEFT JOIN swap ON swap.token_id = t.id AND swap.status = 0 AND swap.is_valid
+    GROUP BY t.id
+) listing
+WHERE listing.id = token.id AND token.floor_price IS DISTINCT FROM listing.price;
+
+INSERT INTO token_stats (token_id, trade_count, volume, last_sale_price, last_sale_level, last_sale_timestamp)
+SELECT
+    t.id,
+    COALESCE(sales.trade_count, 0),
+    COALESCE(sales.volume, 0),
+    last_sale.price,
+    last_sale.level,
+    last_sale.timestamp
+FROM token t
+LEFT JOIN (
+    SELECT trade.token_id, COUNT(*) AS trade_count, SUM(trade.amount * swap.price) AS volume
+    FROM trade JOIN swap ON swap.opid = trade.swap_id
+    GROUP BY trade.token_id
+) sales ON sales.token_id = t.id
+LEFT JOIN (
+    SELECT DISTINCT ON (trade.token_id) trade.token_id, swap.price, trade.level, trade.timestamp
+    FROM trade JOIN swap ON swap.opid = trade.swap_id
+    ORDER BY trade.token_id, trade.id DESC
+) last_sale ON last_sale.token_id = t.id
+WHERE sales.token_id IS NOT NULL
+    OR t.id IN (SELECT token_id FROM token_stats)
+ON CONFLICT (token_id) DO UPDATE SET
+    trade_count = EXCLUDED.trade_count,
+    volume = EXCLUDED.volume,
+    last_sale_price = EXCLUDED.last_sale_price,
+    last_sale_level = EXCLUDED.last_sale_level,
+    last_sale_timestamp = EXCLUDED.last_sale_timestamp;
+
+INSERT INTO creator_stats (creator_id, trade_count, volume, last_sale_price, last_sale_level, last_sale_timestamp, floor_price)
+SELECT
+    h.address,
+    COALESCE(sales.trade_count, 0),
+    COALESCE(sales.volume, 0),
+    last_sale.price,
+    last_sale.level,
+    last_sale.timestamp,
+    listing.price
+FROM holder h
+LEFT JOIN (
+    SELECT token.creator_id, COUNT(*) AS trade_count, SUM(trade.amount * swap.price) AS volume
+    FROM trade
+    JOIN swap ON swap.opid = trade.swap_id
+    JOIN token ON token.id = trade.token_id
+    GROUP BY token.creator_id
+) sales ON sales.creator_id = h.address
+LEFT JOIN (
+    SELECT DISTINCT ON (token.creator_id) token.creator_id, swap.price, trade.level, trade.timestamp
+    FROM trade
+    JOIN swap ON swap.opid = trade.swap_id
+    JOIN token ON token.id = trade.token_id
+    ORDER BY token.creator_id, trade.id DESC
+) last_sale ON last_sale.creator_id = h.address
+LEFT JOIN (
+    SELECT creator_id, MIN(floor_price) AS price
+    FROM token
+    WHERE floor_price IS NOT NULL
+    GROUP BY creator_id
+) listing ON listing.creator_id = h.address
+WHERE sales.creator_id IS NOT NULL
+    OR listing.creator_id IS NOT NULL
+    OR h.address IN (SELECT creator_id FROM creator_stats)
+ON CONFLICT (creator_id) DO UPDATE SET
+    trade_count = EXCLUDED.trade_count,
+    volume = EXCLUDED.volume,
+    last_sale_price = EXCLUDED.last_sale_price,
+    last_sale_level = EXCLUDED.last_sale_level,
+    last_sale_timestamp = EXCLUDED.last_sale_timestamp,
+    floor_price = EXCLUDED.floor_price;
+
+INSERT INTO daily_stats (day, trade_count, volume)
+SELECT (trade.timestamp AT TIME ZONE 'UTC')::date, COUNT(*), SUM(trade.amount * swap.price)
+FROM trade JOIN swap ON swap.opid = trade.swap_id
+GROUP BY 1
+ON CONFLICT (day) DO UPDATE SET
+    trade_count = EXCLUDED.trade_count,
+    volume = EXCLUDED.volume;
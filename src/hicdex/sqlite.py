@@ -0,0 +1,45 @@
+import logging
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+from dipdup.context import DipDupContext
+from dipdup.exceptions import ConfigurationError
+from dipdup.utils.database import get_connection
+
+_logger = logging.getLogger(__name__)
+
+INDEX_SCRIPTS_PATH = Path(__file__).parent / 'sql' / 'on_restart'
+# NOTE: Used by handlers on every operation, created before indexing; `remove_listing` looks up active swaps
+LOOKUP_INDEXES = (
+    '02_active_swaps.sql',
+    '04_lookup_indexes.sql',
+)
+# NOTE: Used by jobs and API only, created once synchronized; inserts into tables without them are cheaper
+DEFERRED_INDEXES = (
+    '01_metadata_indexes.sql',
+    '03_export_indexes.sql',
+)
+
+_PRAGMA_NAME_PATTERN = re.compile(r'^\w+$')
+_PRAGMA_VALUE_PATTERN = re.compile(r'^(-?\d+|\w+)$')
+
+
+async def apply_pragmas(ctx: DipDupContext) -> None:
+    """Tune the SQLite connection with `PRAGMA`s from `custom.sqlite_pragmas`"""
+    pragmas: Dict[str, Any] = ctx.config.custom.get('sqlite_pragmas') or {}
+    conn = get_connection()
+    for name, value in pragmas.items():
+        if not _PRAGMA_NAME_PATTERN.match(name) or not _PRAGMA_VALUE_PATTERN.match(str(value)):
+            raise ConfigurationError(f'Invalid SQLite pragma `{name} = {value}`')
+        await conn.execute_script(f'PRAGMA {name} = {value}')
+        _logger.info('SQLite pragma `%s` set to `%s`', name, value)
+
+
+async def create_indexes(names: Iterable[str]) -> None:
+    """Execute index scripts on SQLite, which DipDup's `execute_sql` refuses to do"""
+    conn = get_connection()
+    for name in names:
+        _logger.info('Executing script `%s`', name)
+        # NOTE: Scripts are formatted like DipDup does; SQLite client executes all statements at once
+        await conn.execute_script((INDEX_SCRIPTS_PATH / name).read_text().format())
@@ -1,28 +1,13 @@
 # generated by datamodel-codegen:
 #   filename:  storage.json
+# NOTE: Trimmed to fields used by handlers, the rest of the storage is neither processed nor parsed.
+# NOTE: Don't run `dipdup init --overwrite-types`; declare a field here to start using it.
 
 from __future__ import annotations
 
-from typing import Dict
-
 from pydantic import BaseModel, Extra
 
 
-class Curations(BaseModel):
-    class Config:
-        extra = Extra.forbid
-
-    hDAO_balance: str
-    issuer: str
-
-
 class HdaoCurationStorage(BaseModel):
     class Config:
-        extra = Extra.forbid
-
-    curations: Dict[str, Curations]
-    fa2: str
-    locked: bool
-    manager: str
-    metadata: Dict[str, str]
-    protocol: str
+        extra = Extra.ignore
@@ -1,44 +1,15 @@
 # generated by datamodel-codegen:
 #   filename:  storage.json
+# NOTE: Trimmed to fields used by handlers, the rest of the storage is neither processed nor parsed.
+# NOTE: Don't run `dipdup init --overwrite-types`; declare a field here to start using it.
 
 from __future__ import annotations
 
-from typing import Dict
-
 from pydantic import BaseModel, Extra
 
 
-class Royalties(BaseModel):
-    class Config:
-        extra = Extra.forbid
-
-    issuer: str
-    royalties: str
-
-
-class Swaps(BaseModel):
-    class Config:
-        extra = Extra.forbid
-
-    issuer: str
-    objkt_amount: str
-    objkt_id: str
-    xtz_per_objkt: str
-
-
 class HenMinterStorage(BaseModel):
     class Config:
-        extra = Extra.forbid
+        extra = Extra.ignore
 
-    curate: str
-    genesis: str
-    hdao: str
-    locked: bool
-    manager: str
-    metadata: Dict[str, str]
-    objkt: str
-    objkt_id: str
-    royalties: Dict[str, Royalties]
-    size: str
     swap_id: str
-    swaps: Dict[str, Swaps]
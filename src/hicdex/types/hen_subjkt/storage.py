@@ -1,29 +1,13 @@
 # generated by datamodel-codegen:
 #   filename:  storage.json
+# NOTE: Trimmed to fields used by handlers, the rest of the storage is neither processed nor parsed.
+# NOTE: Don't run `dipdup init --overwrite-types`; declare a field here to start using it.
 
 from __future__ import annotations
 
-from typing import Dict
-
 from pydantic import BaseModel, Extra
 
 
-class Invoices(BaseModel):
-    class Config:
-        extra = Extra.forbid
-
-    invoice: str
-    subjkt: str
-
-
 class HenSubjktStorage(BaseModel):
     class Config:
-        extra = Extra.forbid
-
-    entries: Dict[str, bool]
-    invoices: Dict[str, Invoices]
-    manager: str
-    metadata: Dict[str, str]
-    registries: Dict[str, str]
-    subjkts: Dict[str, bool]
-    subjkts_metadata: Dict[str, str]
+        extra = Extra.ignore
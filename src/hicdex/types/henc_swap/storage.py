@@ -1,37 +1,15 @@
 # generated by datamodel-codegen:
 #   filename:  storage.json
+# NOTE: Trimmed to fields used by handlers, the rest of the storage is neither processed nor parsed.
+# NOTE: Don't run `dipdup init --overwrite-types`; declare a field here to start using it.
 
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
-
 from pydantic import BaseModel, Extra
 
 
-class Swaps(BaseModel):
-    class Config:
-        extra = Extra.forbid
-
-    creator: str
-    fa2: str
-    issuer: str
-    objkt_amount: str
-    objkt_id: str
-    royalties: str
-    xtz_per_objkt: str
-
-
 class HencSwapStorage(BaseModel):
     class Config:
-        extra = Extra.forbid
+        extra = Extra.ignore
 
-    allowed_fa2s: Dict[str, Dict[str, Any]]
-    collects_paused: bool
     counter: str
-    fee: str
-    fee_recipient: str
-    manager: str
-    metadata: Dict[str, str]
-    proposed_manager: Optional[str]
-    swaps: Dict[str, Swaps]
-    swaps_paused: bool
@@ -0,0 +1,312 @@
+import logging
+from collections import defaultdict
+from types import TracebackType
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type, TypeVar, cast
+
+import dipdup.models
+from dipdup.models import Model
+from dipdup.utils.database import get_connection
+
+import hicdex.models as models
+from hicdex.cache import holder_cache
+from hicdex.utils import mark_clean, query_params
+
+_logger = logging.getLogger(__name__)
+
+RollupT = TypeVar('RollupT', models.TokenStats, models.CreatorStats, models.DailyStats)
+KeyT = TypeVar('KeyT')
+ModelT = TypeVar('ModelT', bound=Model)
+
+# NOTE: Referenced models go first, rows are inserted in this order
+FLUSH_ORDER: Tuple[Type[Model], ...] = (
+    models.Holder,
+    models.Shareholder,
+    models.Token,
+    models.TokenHolder,
+    models.TokenOperator,
+    models.Swap,
+    models.Trade,
+    models.TokenStats,
+    models.CreatorStats,
+    models.DailyStats,
+)
+ROLLUPS: Tuple[Type[Model], ...] = (
+    models.TokenStats,
+    models.CreatorStats,
+    models.DailyStats,
+)
+
+
+class UnitOfWork:
+    """Write-behind buffer for rows touched by a handler.
+
+    Rows are loaded once and kept in an identity map; changes are written on `flush` with a single
+    `bulk_create` for new rows and a single `bulk_update` for modified ones per model. Both go through
+    DipDup's versioned querysets, so `ModelUpdate`s are recorded and rollbacks keep working. Handlers are
+    called inside the level's transaction, so buffered rows are committed together with the index level.
+    """
+
+    def __init__(self) -> None:
+        self._holders: Dict[str, models.Holder] = {}
+        self._tokens: Dict[int, models.Token] = {}
+        self._token_holders: Dict[Tuple[int, str], models.TokenHolder] = {}
+        self._swaps: Dict[Tuple[int, str], models.Swap] = {}
+        self._rollups: Dict[Tuple[Type[Model], Any], Model] = {}
+        self._created: Dict[Type[Model], List[Model]] = defaultdict(list)
+        self._loaded: Dict[Type[Model], List[Model]] = defaultdict(list)
+        self._pending: Set[int] = set()
+
+    async def __aenter__(self) -> 'UnitOfWork':
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        if exc_type is not None:
+            self._evict_holders()
+            return
+        try:
+            await self.flush()
+        except BaseException:
+            self._evict_holders()
+            raise
+
+    def _evict_holders(self) -> None:
+        # NOTE: Rows flushed before the failure are put to the cache, but the level's transaction is rolled back
+        for address in self._holders:
+            holder_cache.discard(address)
+
+    def add(self, model: Model) -> None:
+        """Schedule insertion of a new row"""
+        if not isinstance(model, FLUSH_ORDER):
+            raise TypeError(f'{type(model).__name__} rows are not handled by `UnitOfWork`')
+        self._remember(model)
+        self._created[type(model)].append(model)
+        self._pending.add(id(model))
+
+    def track(self, model: Model) -> None:
+        """Watch a row loaded from the database for changes"""
+        if self._remember(model):
+            self._loaded[type(model)].append(model)
+
+    def _remember(self, model: Model) -> bool:
+        """Put row to the identity map, return `False` if it's already there"""
+        if isinstance(model, models.Holder):
+            return _put(self._holders, model.address, model)
+        if isinstance(model, models.Token):
+            return _put(self._tokens, model.id, model)
+        if isinstance(model, models.TokenHolder):
+            return _put(self._token_holders, (model.token_id, model.holder_id), model)
+        if isinstance(model, models.Swap):
+            return _put(self._swaps, (model.id, model.contract_address), model)
+        if isinstance(model, ROLLUPS):
+            return _put(self._rollups, (type(model), model.pk), model)
+        return True
+
+    def is_pending(self, model: Model) -> bool:
+        """Whether the row is scheduled for insertion and not in the database yet"""
+        return id(model) in self._pending
+
+    async def get_holder(self, address: str) -> models.Holder:
+        await self.prefetch_holders((address,))
+        return self._holders[address]
+
+    async def prefetch_holders(self, addresses: Iterable[str]) -> None:
+        """Load holders missing in the identity map with a single query, create the ones not found"""
+        missing = set()
+        for address in addresses:
+            if address in self._holders:
+                continue
+            if (cached := holder_cache.get(address)) is not None:
+                self.track(cached)
+            else:
+                missing.add(address)
+        if not missing:
+            return
+
+        for holder in await models.Holder.filter(address__in=missing):
+            holder_cache.put(holder)
+            self.track(holder)
+            missing.discard(holder.address)
+        for address in missing:
+            self.add(models.Holder(address=address))
+
+    async def get_token(self, token_id: int) -> models.Token:
+        if (token := self._tokens.get(token_id)) is not None:
+            return token
+
+        token = await models.Token.get(id=token_id)
+        self.track(token)
+        return token
+
+    async def prefetch_tokens(self, token_ids: Iterable[int], create: bool = False) -> None:
+        """Load tokens missing in the identity map with a single query; unknown ids are left to `get_token` unless
+        `create` is set, then empty tokens are created for them
+        """
+        missing = {token_id for token_id in token_ids if token_id not in self._tokens}
+        if not missing:
+            return
+
+        for token in await models.Token.filter(id__in=missing):
+            self.track(token)
+            missing.discard(token.id)
+        if create:
+            for token_id in missing:
+                self.add(models.Token(id=token_id))
+
+    async def get_token_holder(self, token: models.Token, holder: models.Holder) -> models.TokenHolder:
+        key = (token.id, holder.address)
+        await self.prefetch_token_holders((key,))
+        return self._token_holders[key]
+
+    async def prefetch_token_holders(self, keys: Iterable[Tuple[int, str]]) -> None:
+        """Load `TokenHolder` rows by (token id, holder address) with a single query, create the ones not found"""
+        missing = {key for key in keys if key not in self._token_holders}
+        # NOTE: There are no rows for tokens and holders not inserted yet
+        stored = {
+            (token_id, address)
+            for token_id, address in missing
+            if not self._is_pending_key(self._tokens, token_id) and not self._is_pending_key(self._holders, address)
+        }
+        if stored:
+            token_holders = await models.TokenHolder.filter(
+                token_id__in={token_id for token_id, _ in stored},
+                holder_id__in={address for _, address in stored},
+            )
+            for token_holder in token_holders:
+                key = (token_holder.token_id, token_holder.holder_id)
+                # NOTE: Filter matches all combinations of requested tokens and holders
+                if key in missing:
+                    self.track(token_holder)
+                    missing.discard(key)
+
+        for token_id, address in missing:
+            self.add(models.TokenHolder(token_id=token_id, holder_id=address, quantity=0))
+
+    async def increment_token_holders(self, deltas: Dict[Tuple[int, str], int]) -> Dict[Tuple[int, str], int]:
+        """Add amounts to quantities of (token id, holder address) pairs, return new quantities.
+
+        Outside of versioned transactions rows missing in the identity map are upserted with a single
+        `INSERT ... ON CONFLICT` adding to the stored quantity, nothing is read beforehand. Within rollback depth
+        rows are loaded and changed in place, so `ModelUpdate`s are recorded.
+        """
+        quantities: Dict[Tuple[int, str], int] = {}
+        if dipdup.models.get_transaction():
+            await self.prefetch_token_holders(deltas)
+        else:
+            upserted = {key: amount for key, amount in deltas.items() if key not in self._token_holders}
+            if upserted:
+                if self._pending:
+                    # NOTE: Referenced holders must be inserted first
+                    await self.flush()
+                quantities.update(await self._upsert_token_holders(upserted))
+
+        for key, amount in deltas.items():
+            if key not in quantities:
+                token_holder = self._token_holders[key]
+                token_holder.quantity += amount
+                quantities[key] = token_holder.quantity
+        return quantities
+
+    async def _upsert_token_holders(self, deltas: Dict[Tuple[int, str], int]) -> Dict[Tuple[int, str], int]:
+        conn = get_connection()
+        params = query_params(conn, len(deltas) * 3)
+        rows_params = ', '.join(f'({", ".join(params[i : i + 3])})' for i in range(0, len(params), 3))
+        query = (
+            f'INSERT INTO token_holder (token_id, holder_id, quantity) VALUES {rows_params} '
+            'ON CONFLICT (token_id, holder_id) DO UPDATE SET quantity = token_holder.quantity + excluded.quantity '
+            'RETURNING token_id, holder_id, quantity'
+        )
+        values = [value for (token_id, address), amount in deltas.items() for value in (token_id, address, amount)]
+        _, rows = await conn.execute_query(query, values)
+        return {(row['token_id'], row['holder_id']): row['quantity'] for row in rows}
+
+    async def increment_token(self, token_id: int, field: str, amount: int) -> None:
+        """Add amount to a numeric `Token` field; outside of versioned transactions it's done in SQL without reading"""
+        if dipdup.models.get_transaction() or token_id in self._tokens:
+            token = await self.get_token(token_id)
+            setattr(token, field, getattr(token, field) + amount)
+            return
+
+        conn = get_connection()
+        column = models.Token._meta.fields_map[field].source_field or field
+        amount_param, id_param = query_params(conn, 2)
+        await conn.execute_query(
+            f'UPDATE token SET {column} = {column} + {amount_param} WHERE id = {id_param}',
+            [amount, token_id],
+        )
+
+    def _is_pending_key(self, identity_map: Dict[Any, Any], key: Any) -> bool:
+        model = identity_map.get(key)
+        return model is not None and self.is_pending(model)
+
+    async def get_swap(self, swap_id: int, contract_address: str) -> models.Swap:
+        key = (swap_id, contract_address)
+        if (swap := self._swaps.get(key)) is not None:
+            return swap
+
+        swap = await models.Swap.filter(id=swap_id, contract_address=contract_address).get()
+        self.track(swap)
+        return swap
+
+    async def get_rollup(self, model_cls: Type[RollupT], pk: Any) -> RollupT:
+        """Get rollup row by primary key, creating an empty one if missing"""
+        key: Tuple[Type[Model], Any] = (model_cls, pk)
+        if key not in self._rollups:
+            rollup = await model_cls.get_or_none(pk=pk)
+            if rollup is None:
+                self.add(model_cls(**{model_cls._meta.pk_attr: pk}))
+            else:
+                self.track(rollup)
+        return cast(RollupT, self._rollups[key])
+
+    async def flush(self) -> None:
+        """Write all buffered changes to the database"""
+        for model_cls in FLUSH_ORDER:
+            created = self._created.pop(model_cls, [])
+            if created:
+                _logger.debug('Inserting %s %s rows', len(created), model_cls.__name__)
+                await self._insert(model_cls, created)
+
+            loaded = self._loaded.pop(model_cls, [])
+            changed_fields: Set[str] = set()
+            changed: List[Model] = []
+            for model in loaded:
+                if diff := model.versioned_data_diff:
+                    changed_fields.update(diff)
+                    changed.append(model)
+            if changed:
+                _logger.debug('Updating %s %s rows: %s', len(changed), model_cls.__name__, changed_fields)
+                await model_cls.bulk_update(changed, fields=sorted(changed_fields))
+
+            for model in created:
+                mark_clean(model)
+                if isinstance(model, models.Holder):
+                    holder_cache.put(model)
+            for model in changed:
+                mark_clean(model)
+                if isinstance(model, models.Holder):
+                    holder_cache.update(model, changed_fields)
+            self._loaded[model_cls] = [*loaded, *created]
+
+        self._pending.clear()
+
+    async def _insert(self, model_cls: Type[Model], created: List[Model]) -> None:
+        # NOTE: DipDup records `ModelUpdate`s of bulk inserts before primary keys are generated
+        if dipdup.models.get_transaction() and model_cls._meta.pk.generated:
+            for model in created:
+                if model.pk is None:
+                    await model.save()
+            created = [model for model in created if not model._saved_in_db]
+        if created:
+            await model_cls.bulk_create(created)
+
+
+def _put(identity_map: Dict[KeyT, ModelT], key: KeyT, model: ModelT) -> bool:
+    if identity_map.get(key) is model:
+        return False
+    identity_map[key] = model
+    return True
@@ -1,12 +1,19 @@
+import asyncio
 import json
 import logging
 from contextlib import suppress
-from typing import Any
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, List, Sequence, Type, TypeVar
 
 import aiohttp
+from dipdup.context import DipDupContext
+from dipdup.models import Model
+from dipdup.utils.database import get_connection
 
 _logger = logging.getLogger(__name__)
 
+T = TypeVar('T')
+ModelT = TypeVar('ModelT', bound=Model)
+
 
 def clean_null_bytes(string: str) -> str:
     if string is None:
@@ -27,6 +34,66 @@ def fromhex(hexbytes: str) -> str:
     return clean_null_bytes(string or '')
 
 
+def is_postgres(ctx: DipDupContext) -> bool:
+    """Project SQL scripts can only be executed on PostgreSQL"""
+    return ctx.config.database.kind == 'postgres'
+
+
+def is_enabled(value: Any) -> bool:
+    """Parse a flag from `custom` config; values substituted from environment variables are strings"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def mark_clean(model: Model) -> None:
+    """Treat current state of the model as the one stored in the database"""
+    model._saved_in_db = True
+    model._original_versioned_data = model.versioned_data
+
+
+def query_params(conn: Any, count: int) -> List[str]:
+    """Query parameter placeholders in the style of the database driver"""
+    if conn.capabilities.dialect == 'postgres':
+        return [f'${i + 1}' for i in range(count)]
+    return ['?'] * count
+
+
+async def insert_unversioned(model_cls: Type[ModelT], rows: Sequence[ModelT]) -> None:
+    """Insert rows skipping ones which conflict with existing ones; generated primary keys are left to the database.
+
+    DipDup's versioned transaction is process-wide. Jobs run concurrently with indexing, so their writes through
+    querysets would be recorded as `ModelUpdate`s of an open level and reverted on its rollback. Raw queries
+    bypass that.
+    """
+    if not rows:
+        return
+    meta = model_cls._meta
+    fields = [field for field in meta.fields_db_projection if not (field == meta.pk_attr and meta.pk.generated)]
+    conn = get_connection()
+    params = query_params(conn, len(fields) * len(rows))
+    values_sql = ', '.join(f'({", ".join(params[i : i + len(fields)])})' for i in range(0, len(params), len(fields)))
+    columns = ', '.join(f'"{meta.fields_db_projection[field]}"' for field in fields)
+    values = [meta.fields_map[field].to_db_value(getattr(row, field), row) for row in rows for field in fields]
+    await conn.execute_query(
+        f'INSERT INTO "{meta.db_table}" ({columns}) VALUES {values_sql} ON CONFLICT DO NOTHING',
+        values,
+    )
+
+
+async def update_unversioned(model: Model, fields: Sequence[str]) -> None:
+    """Write fields of a stored row; see `insert_unversioned`"""
+    meta = model._meta
+    conn = get_connection()
+    params = query_params(conn, len(fields) + 1)
+    assignments = ', '.join(f'"{meta.fields_db_projection[field]}" = {param}' for field, param in zip(fields, params))
+    values = [meta.fields_map[field].to_db_value(getattr(model, field), model) for field in fields]
+    await conn.execute_query(
+        f'UPDATE "{meta.db_table}" SET {assignments} WHERE "{meta.db_pk_column}" = {params[-1]}',
+        [*values, model.pk],
+    )
+
+
 async def http_request(
     session: aiohttp.ClientSession,
     method: str,
@@ -47,3 +114,37 @@ async def http_request(
         **kwargs,
     ) as response:
         return await response.json(content_type=None)
+
+
+async def iterate(items: Iterable[T]) -> AsyncIterator[T]:
+    for item in items:
+        yield item
+
+
+async def gather_bounded(
+    items: AsyncIterable[T],
+    callback: Callable[[T], Awaitable[None]],
+    concurrency: int,
+) -> None:
+    """Call `callback` for every item with at most `concurrency` calls in flight; failures are logged"""
+    queue: asyncio.Queue[T] = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def _worker() -> None:
+        while True:
+            item = await queue.get()
+            try:
+                await callback(item)
+            except Exception as e:
+                _logger.exception('failed to process %s: %s', item, e)
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(_worker()) for _ in range(concurrency)]
+    try:
+        async for item in items:
+            await queue.put(item)
+        await queue.join()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
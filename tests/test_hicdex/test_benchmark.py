@@ -0,0 +1,162 @@
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Dict
+from unittest import IsolatedAsyncioTestCase
+
+from dipdup.config import DipDupConfig
+
+from hicdex.benchmark import IPFS_FIXTURES, LocalIpfsDatasource, normalize_query, percentile, run
+from hicdex.handlers.on_transfer import BURN_ADDRESS
+
+CONFIG_PATH = Path(__file__).parent.parent.parent / 'dipdup.yml'
+HEN_SWAP_V1 = 'KT1Hkg5qeNhfwpKW4fXvq7HGZB9z2EnmCCA9'
+HEN_OBJKTS = 'KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton'
+CREATOR = 'tz1creator00000000000000000000000000'
+COLLECTOR = 'tz1collector000000000000000000000000'
+OPERATOR = 'KT1operator0000000000000000000000000'
+CID = 'QmMetadata'
+
+
+def _transaction(
+    id_: int, level: int, hash_: str, sender: str, target: str, entrypoint: str, value: Any
+) -> Dict[str, Any]:
+    return {
+        'type': 'transaction',
+        'id': id_,
+        'level': level,
+        'timestamp': '2021-03-01T00:00:00Z',
+        'hash': hash_,
+        'counter': 1,
+        'sender': {'address': sender},
+        'target': {'address': target},
+        'parameter': {'entrypoint': entrypoint, 'value': value},
+        'amount': 0,
+        'status': 'applied',
+        'storage': {'swap_id': '0'},
+        'diffs': [],
+    }
+
+
+class BenchmarkTest(IsolatedAsyncioTestCase):
+    async def test_replay(self) -> None:
+        metadata = f'ipfs://{CID}'.encode().hex()
+        operations = [
+            _transaction(
+                1,
+                100,
+                'oo1',
+                CREATOR,
+                HEN_SWAP_V1,
+                'mint_OBJKT',
+                {'address': CREATOR, 'amount': '10', 'metadata': metadata, 'royalties': '100'},
+            ),
+            _transaction(
+                2,
+                100,
+                'oo1',
+                HEN_SWAP_V1,
+                HEN_OBJKTS,
+                'mint',
+                {'address': CREATOR, 'amount': '10', 'token_id': '152', 'token_info': {'': metadata}},
+            ),
+            _transaction(
+                3,
+                101,
+                'oo2',
+                CREATOR,
+                HEN_OBJKTS,
+                'transfer',
+                [{'from_': CREATOR, 'txs': [{'to_': COLLECTOR, 'token_id': '152', 'amount': '3'}]}],
+            ),
+            _transaction(
+                4,
+                101,
+                'oo2',
+                COLLECTOR,
+                HEN_OBJKTS,
+                'update_operators',
+                [
+                    {'add_operator': {'owner': COLLECTOR, 'operator': OPERATOR, 'token_id': '152'}},
+                    {'add_operator': {'owner': COLLECTOR, 'operator': OPERATOR, 'token_id': '152'}},
+                    {'add_operator': {'owner': COLLECTOR, 'operator': CREATOR, 'token_id': '152'}},
+                ],
+            ),
+            # NOTE: Both holders exist already, nothing is pending before the upsert
+            _transaction(
+                5,
+                102,
+                'oo4',
+                CREATOR,
+                HEN_OBJKTS,
+                'transfer',
+                [{'from_': CREATOR, 'txs': [{'to_': COLLECTOR, 'token_id': '152', 'amount': '2'}]}],
+            ),
+            # NOTE: Within rollback depth of the last level, unlike the previous ones
+            _transaction(
+                7,
+                200,
+                'oo3',
+                COLLECTOR,
+                HEN_OBJKTS,
+                'transfer',
+                [{'from_': COLLECTOR, 'txs': [{'to_': BURN_ADDRESS, 'token_id': '152', 'amount': '1'}]}],
+            ),
+            _transaction(
+                7,
+                200,
+                'oo3',
+                COLLECTOR,
+                HEN_OBJKTS,
+                'update_operators',
+                [
+                    {'remove_operator': {'owner': COLLECTOR, 'operator': OPERATOR, 'token_id': '152'}},
+                    {'remove_operator': {'owner': COLLECTOR, 'operator': OPERATOR, 'token_id': '153'}},
+                ],
+            ),
+        ]
+
+        config = DipDupConfig.load([CONFIG_PATH])
+        config.initialize()
+
+        with TemporaryDirectory() as tmp:
+            fixtures = Path(tmp)
+            (fixtures / 'operations.json').write_text(json.dumps(operations))
+            (fixtures / IPFS_FIXTURES).mkdir()
+            (fixtures / IPFS_FIXTURES / f'{CID}.json').write_text(json.dumps({'name': 'objkt'}))
+
+            stats = await run(config, fixtures, 'sqlite://:memory:', explain_queries=True)
+
+        assert stats.operations == 7
+        assert stats.levels == 4
+        assert {name: len(samples) for name, samples in stats.latencies.items()} == {
+            'on_mint': 1,
+            'on_transfer': 3,
+            'on_operator_update': 2,
+        }
+        assert stats.queries > 0
+        assert stats.metadata_tasks == 1
+        # NOTE: Full scans are marked with `!`
+        assert stats.plans
+        assert [plan for _, _, plan in stats.plans if not plan or '!' in plan] == []
+
+    async def test_local_ipfs(self) -> None:
+        with TemporaryDirectory() as tmp:
+            (Path(tmp) / f'{CID}.json').write_text(json.dumps({'name': 'objkt'}))
+            datasource = LocalIpfsDatasource(Path(tmp))
+
+            assert await datasource.get(CID) == {'name': 'objkt'}
+            assert await datasource.get('QmMissing') is None
+
+    async def test_normalize_query(self) -> None:
+        assert normalize_query('SELECT "id","title" FROM "token" WHERE "id" IN (1,2,3)') == (
+            'SELECT ... FROM "token" WHERE "id" IN (...)'
+        )
+        assert normalize_query('UPDATE "holder" SET "name"=CASE WHEN "address"=\'tz1a\' THEN \'a\' END') == (
+            'UPDATE "holder" SET "name"=CASE WHEN ... END'
+        )
+
+    async def test_percentile(self) -> None:
+        assert percentile([], 0.5) == 0.0
+        assert percentile([float(i) for i in range(100)], 0.99) == 99.0
+        assert percentile([3.0, 1.0, 2.0], 0.5) == 2.0
@@ -0,0 +1,122 @@
+from unittest import IsolatedAsyncioTestCase
+
+from dipdup.transactions import TransactionManager
+from dipdup.utils.database import generate_schema, get_connection, tortoise_wrapper
+
+import hicdex.models as models
+from hicdex.cache import HolderCache, SplitContractRegistry, holder_cache
+from hicdex.unit_of_work import UnitOfWork
+from hicdex.utils import mark_clean
+
+
+class HolderCacheTest(IsolatedAsyncioTestCase):
+    async def test_lru_eviction(self) -> None:
+        cache = HolderCache(size=2)
+        for address in ('tz1a', 'tz1b'):
+            cache.put(models.Holder(address=address))
+
+        assert cache.get('tz1a') is not None
+        cache.put(models.Holder(address='tz1c'))
+
+        assert len(cache) == 2
+        assert cache.get('tz1b') is None
+        assert cache.get('tz1a') is not None
+        assert cache.get('tz1c') is not None
+
+    async def test_get_returns_copies(self) -> None:
+        cache = HolderCache()
+        cache.put(models.Holder(address='tz1a'))
+
+        holder = cache.get('tz1a')
+        assert holder is not None
+        holder.hdao_balance += 10
+        assert holder.versioned_data_diff == {'hdao_balance': 0}
+
+        other = cache.get('tz1a')
+        assert other is not None and other is not holder
+        assert other.hdao_balance == 0
+
+        mark_clean(holder)
+        cache.put(holder)
+        holder.hdao_balance += 10
+        other = cache.get('tz1a')
+        assert other is not None
+        assert other.hdao_balance == 10
+        assert not other.versioned_data_diff
+
+    async def test_units_of_work_do_not_share_holders(self) -> None:
+        async with tortoise_wrapper('sqlite://:memory:', 'hicdex'):
+            await generate_schema(get_connection(), 'public')
+            async with TransactionManager(depth=2).register():
+                await models.Holder.create(address='tz1a')
+                holder_cache.clear()
+
+                async with UnitOfWork() as uow:
+                    (await uow.get_holder('tz1a')).hdao_balance += 10
+                    # NOTE: Another index flushes the same holder in the meantime
+                    async with UnitOfWork() as other:
+                        (await other.get_holder('tz1a')).tokens_held += 1
+                    assert (await models.Holder.get(address='tz1a')).hdao_balance == 0
+
+                holder = await models.Holder.get(address='tz1a')
+                assert (holder.hdao_balance, holder.tokens_held) == (10, 1)
+                cached = holder_cache.get('tz1a')
+                assert cached is not None
+                assert (cached.hdao_balance, cached.tokens_held) == (10, 1)
+
+                with self.assertRaises(ValueError):
+                    async with UnitOfWork() as failed:
+                        (await failed.get_holder('tz1a')).sales_volume += 5
+                        await failed.flush()
+                        raise ValueError
+                assert holder_cache.get('tz1a') is None
+
+    async def test_discard_and_clear(self) -> None:
+        cache = HolderCache()
+        cache.put(models.Holder(address='tz1a'))
+        cache.put(models.Holder(address='tz1b'))
+
+        cache.discard('tz1a')
+        assert cache.get('tz1a') is None
+
+        cache.clear()
+        assert len(cache) == 0
+
+
+class SplitContractRegistryTest(IsolatedAsyncioTestCase):
+    async def test_load_and_put(self) -> None:
+        async with tortoise_wrapper('sqlite://:memory:', 'hicdex'):
+            await generate_schema(get_connection(), 'public')
+            async with TransactionManager(depth=2).register():
+                for address in ('KT1a', 'KT1b', 'tz1a', 'tz1b'):
+                    await models.Holder.create(address=address)
+                contract = await models.SplitContract.create(contract_id='KT1a', signatures_required=1)
+                for address, holder_type in (
+                    ('tz1a', models.ShareholderStatus.core_participant),
+                    ('tz1b', models.ShareholderStatus.benefactor),
+                ):
+                    await models.Shareholder.create(
+                        split_contract=contract, holder_id=address, shares=1, holder_type=holder_type
+                    )
+
+                registry = SplitContractRegistry()
+                # NOTE: Not loaded yet, will be read from the database
+                registry.put(contract, ('tz1a',))
+                assert len(registry) == 0
+
+                info = await registry.get('KT1a')
+                assert info is not None
+                assert info.id == contract.id
+                assert info.signatures_required == 1
+                assert info.core_participants == {'tz1a'}
+                assert await registry.get('KT1b') is None
+
+                other = await models.SplitContract.create(contract_id='KT1b', signatures_required=2)
+                registry.put(other, ('tz1a', 'tz1b'))
+                assert len(registry) == 2
+                info = await registry.get('KT1b')
+                assert info is not None
+                assert info.core_participants == {'tz1a', 'tz1b'}
+
+                registry.clear()
+                assert len(registry) == 0
@@ -0,0 +1,70 @@
+import os
+from types import SimpleNamespace
+from typing import Set, cast
+from unittest import IsolatedAsyncioTestCase, skipIf
+
+from dipdup.context import DipDupContext
+from dipdup.transactions import TransactionManager
+from dipdup.utils.database import generate_schema, get_connection, tortoise_wrapper
+
+import hicdex.models as models
+from hicdex.deferred_indexes import DEFERRED_TABLES, build_deferred_indexes, defer_indexes, has_deferred_indexes
+
+# NOTE: Schema `public` of this database is dropped
+POSTGRES_TEST_URL = os.environ.get('POSTGRES_TEST_URL')
+
+
+async def _valid_foreign_keys() -> Set[str]:
+    _, rows = await get_connection().execute_query(
+        "SELECT conname FROM pg_constraint WHERE contype = 'f' AND convalidated AND conrelid::regclass::text = ANY($1)",
+        [list(DEFERRED_TABLES)],
+    )
+    return {row['conname'] for row in rows}
+
+
+@skipIf(POSTGRES_TEST_URL is None, 'POSTGRES_TEST_URL is not set')
+class DeferredIndexesTest(IsolatedAsyncioTestCase):
+    async def test_defer_and_build(self) -> None:
+        ctx = cast(DipDupContext, SimpleNamespace(config=SimpleNamespace(schema_name='public')))
+        async with tortoise_wrapper(cast(str, POSTGRES_TEST_URL), 'hicdex'), TransactionManager(depth=2).register():
+            conn = get_connection()
+            await conn.execute_script('DROP SCHEMA IF EXISTS public CASCADE; CREATE SCHEMA public')
+            await generate_schema(conn, 'public')
+            foreign_keys = await _valid_foreign_keys()
+
+            await defer_indexes(ctx)
+            assert await _valid_foreign_keys() == set()
+            deferred = await models.DeferredIndex.all()
+            assert {item.name for item in deferred if item.is_constraint} == foreign_keys
+            assert any(not item.is_constraint for item in deferred)
+
+            # NOTE: Not checked while foreign keys are deferred
+            await conn.execute_script("INSERT INTO token_holder (token_id, holder_id, quantity) VALUES (1, 'tz1', 1)")
+            await build_deferred_indexes(ctx)
+            left = await models.DeferredIndex.all()
+            assert left
+            assert all(item.is_constraint and item.table_name == 'token_holder' for item in left)
+            assert await _valid_foreign_keys() == foreign_keys - {item.name for item in left}
+
+            await models.TokenHolder.all().delete()
+            await build_deferred_indexes(ctx)
+            assert await models.DeferredIndex.all().count() == 0
+            assert await _valid_foreign_keys() == foreign_keys
+
+    async def test_restart(self) -> None:
+        ctx = cast(DipDupContext, SimpleNamespace(config=SimpleNamespace(schema_name='public')))
+        async with tortoise_wrapper(cast(str, POSTGRES_TEST_URL), 'hicdex'), TransactionManager(depth=2).register():
+            conn = get_connection()
+            await conn.execute_script('DROP SCHEMA IF EXISTS public CASCADE; CREATE SCHEMA public')
+            await generate_schema(conn, 'public')
+            foreign_keys = await _valid_foreign_keys()
+            await defer_indexes(ctx)
+
+            # NOTE: Same as DipDup does on startup; indexes are back, foreign keys are not
+            await generate_schema(conn, 'public')
+            assert await _valid_foreign_keys() == set()
+            assert await has_deferred_indexes()
+
+            await build_deferred_indexes(ctx)
+            assert not await has_deferred_indexes()
+            assert await _valid_foreign_keys() == foreign_keys
@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from typing import Any, List
+from unittest import IsolatedAsyncioTestCase, skipIf
+
+from hicdex.export import TableExporter, pa, pq
+
+
+class _Cursor:
+    def __init__(self, rows: List[Any]) -> None:
+        self._rows = rows
+
+    async def fetch(self, n: int) -> List[Any]:
+        rows, self._rows = self._rows[:n], self._rows[n:]
+        return rows
+
+
+class _Statement:
+    def __init__(self, columns: List[Any], rows: List[Any]) -> None:
+        self._columns = columns
+        self._rows = rows
+
+    def get_attributes(self) -> List[Any]:
+        return [SimpleNamespace(name=name, type=SimpleNamespace(name=type_)) for name, type_ in self._columns]
+
+    async def cursor(self, *args: Any) -> _Cursor:
+        return _Cursor(self._rows)
+
+
+class _Connection:
+    def __init__(self, statement: _Statement) -> None:
+        self._statement = statement
+
+    async def prepare(self, query: str) -> _Statement:
+        return self._statement
+
+
+@skipIf(pa is None, 'pyarrow is not installed')
+class TableExporterTest(IsolatedAsyncioTestCase):
+    async def test_export_in_batches(self) -> None:
+        timestamp = datetime(2021, 3, 1, tzinfo=timezone.utc)
+        rows = [(i, f'title {i}', {'tags': [i]}, timestamp, None) for i in range(5)]
+        columns = [
+            ('id', 'int8'),
+            ('title', 'text'),
+            ('extra', 'jsonb'),
+            ('timestamp', 'timestamptz'),
+            ('price', 'int8'),
+        ]
+        exporter = TableExporter(_Connection(_Statement(columns, rows)), batch_size=2)
+
+        with TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'token' / '0000000001-0000000010.parquet'
+            assert await exporter.export(path, 'SELECT') == 5
+
+            table = pq.read_table(path)
+            assert table.column_names == ['id', 'title', 'extra', 'timestamp', 'price']
+            assert table.column('id').to_pylist() == [0, 1, 2, 3, 4]
+            assert table.column('extra').to_pylist()[1] == '{"tags": [1]}'
+            assert table.column('price').null_count == 5
+
+    async def test_no_file_for_empty_result(self) -> None:
+        exporter = TableExporter(_Connection(_Statement([('id', 'int8')], [])))
+
+        with TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'trade' / '0000000001-0000000010.parquet'
+            assert await exporter.export(path, 'SELECT') == 0
+            assert not path.parent.exists()
@@ -0,0 +1,84 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import cast
+from unittest import IsolatedAsyncioTestCase
+
+from dipdup.context import HandlerContext
+from dipdup.models import Transaction
+from dipdup.transactions import TransactionManager
+from dipdup.utils.database import generate_schema, get_connection, tortoise_wrapper
+
+import hicdex.models as models
+from hicdex.cache import holder_cache
+from hicdex.handlers.on_subjkt_register import on_subjkt_register
+from hicdex.handlers.on_swap_v2 import on_swap_v2
+from hicdex.types.hen_subjkt.parameter.registry import RegistryParameter
+from hicdex.types.hen_subjkt.storage import HenSubjktStorage
+from hicdex.types.hen_swap_v2.parameter.swap import SwapParameter
+from hicdex.types.hen_swap_v2.storage import HenSwapV2Storage
+
+HOLDER = 'tz1holder000000000000000000000000000'
+SWAP_V2 = 'KT1HbQepzV1nVGg8QVznG7z4RcHseD5kwqBn'
+
+
+def _registry(level: int, metadata: str) -> Transaction[RegistryParameter, HenSubjktStorage]:
+    data = SimpleNamespace(sender_address=HOLDER, level=level)
+    parameter = RegistryParameter(subjkt='name'.encode().hex(), metadata=metadata.encode().hex())
+    return cast(Transaction[RegistryParameter, HenSubjktStorage], SimpleNamespace(data=data, parameter=parameter))
+
+
+def _swap_v2(opid: int, counter: int, price: int) -> Transaction[SwapParameter, HenSwapV2Storage]:
+    data = SimpleNamespace(
+        sender_address=HOLDER,
+        target_address=SWAP_V2,
+        id=opid,
+        hash='oo' * 25 + 'o',
+        level=opid,
+        timestamp=datetime(2021, 3, 1, tzinfo=timezone.utc),
+    )
+    parameter = SwapParameter(creator=HOLDER, objkt_amount='2', objkt_id='1', royalties='0', xtz_per_objkt=str(price))
+    storage = SimpleNamespace(counter=str(counter))
+    return cast(
+        Transaction[SwapParameter, HenSwapV2Storage],
+        SimpleNamespace(data=data, parameter=parameter, storage=storage),
+    )
+
+
+class OnSubjktRegisterTest(IsolatedAsyncioTestCase):
+    async def test_description_kept_until_resolved(self) -> None:
+        ctx = cast(HandlerContext, None)
+        async with tortoise_wrapper('sqlite://:memory:', 'hicdex'), TransactionManager().register():
+            await generate_schema(get_connection(), 'public')
+            holder_cache.clear()
+            await models.Holder.create(address=HOLDER, description='old', metadata={'description': 'old'})
+
+            await on_subjkt_register(ctx, _registry(10, 'ipfs://Qm1'))
+
+            holder = await models.Holder.get(address=HOLDER)
+            assert (holder.name, holder.metadata_file, holder.metadata) == ('name', 'ipfs://Qm1', {})
+            assert holder.description == 'old'
+            assert await models.MetadataTask.filter(key=HOLDER).count() == 1
+
+            await on_subjkt_register(ctx, _registry(11, ''))
+            assert (await models.Holder.get(address=HOLDER)).description == ''
+
+
+class OnSwapTest(IsolatedAsyncioTestCase):
+    async def test_listing(self) -> None:
+        ctx = cast(HandlerContext, None)
+        async with tortoise_wrapper('sqlite://:memory:', 'hicdex'), TransactionManager().register():
+            await generate_schema(get_connection(), 'public')
+            holder_cache.clear()
+            await models.Holder.create(address=HOLDER)
+            await models.Token.create(id=1, creator_id=HOLDER, royalties=0, title='title')
+
+            await on_swap_v2(ctx, _swap_v2(100, 1, 500))
+            await on_swap_v2(ctx, _swap_v2(101, 2, 300))
+
+            swaps = await models.Swap.filter(contract_address=SWAP_V2).order_by('id')
+            assert [(swap.id, swap.opid, swap.price, swap.is_valid) for swap in swaps] == [
+                (0, 100, 500, True),
+                (1, 101, 300, True),
+            ]
+            assert (await models.Token.get(id=1)).floor_price == 300
+            assert (await models.CreatorStats.get(creator_id=HOLDER)).floor_price == 300
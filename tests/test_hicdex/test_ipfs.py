@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+from unittest import IsolatedAsyncioTestCase
+
+from dipdup.transactions import TransactionManager
+from dipdup.utils.database import generate_schema, get_connection, tortoise_wrapper
+
+import hicdex.models as models
+from hicdex.ipfs import (
+    MAX_TIMEOUT,
+    MIN_SAMPLES,
+    MIN_TIMEOUT,
+    GatewayLatency,
+    fetch_ipfs_json,
+    get_cached,
+    prune_cache,
+    put_cached,
+)
+
+
+class FakeIpfsDatasource:
+    def __init__(self, delay: float, data: Any = None, error: Optional[Exception] = None) -> None:
+        self.delay = delay
+        self.data = data
+        self.error = error
+        self.cancelled = False
+
+    async def get(self, path: str) -> Any:
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.data
+
+
+def make_ctx(datasources: Dict[str, FakeIpfsDatasource], **custom: Any) -> Any:
+    return SimpleNamespace(
+        config=SimpleNamespace(custom=custom),
+        get_ipfs_datasource=datasources.__getitem__,
+    )
+
+
+class GatewayLatencyTest(IsolatedAsyncioTestCase):
+    async def test_timeout(self) -> None:
+        latency = GatewayLatency()
+        assert latency.timeout() == MAX_TIMEOUT
+
+        for _ in range(MIN_SAMPLES):
+            latency.observe(0.1)
+        assert latency.timeout() == MIN_TIMEOUT
+
+        for _ in range(MIN_SAMPLES):
+            latency.observe(4.0)
+        assert latency.timeout() == 12.0
+
+
+class FetchIpfsJsonTest(IsolatedAsyncioTestCase):
+    async def test_hedged_request_wins(self) -> None:
+        datasources = {
+            'ipfs': FakeIpfsDatasource(delay=5, data={'name': 'slow'}),
+            'fallback_ipfs': FakeIpfsDatasource(delay=0.01, data={'name': 'fast'}),
+            'fallback2_ipfs': FakeIpfsDatasource(delay=5, data={'name': 'slowest'}),
+        }
+        ctx = make_ctx(datasources, ipfs_hedge_delay=0.05)
+
+        assert await fetch_ipfs_json(ctx, 'ipfs://cid') == {'name': 'fast'}
+        assert datasources['ipfs'].cancelled
+
+    async def test_failures_fall_through(self) -> None:
+        datasources = {
+            'ipfs': FakeIpfsDatasource(delay=0, error=RuntimeError('boom')),
+            'fallback_ipfs': FakeIpfsDatasource(delay=0, data=['not', 'a', 'document']),
+            'fallback2_ipfs': FakeIpfsDatasource(delay=0, data={'name': 'last'}),
+        }
+        ctx = make_ctx(datasources, ipfs_hedging=False)
+
+        assert await fetch_ipfs_json(ctx, 'ipfs://cid') == {'name': 'last'}
+
+    async def test_nothing_found(self) -> None:
+        datasources = {name: FakeIpfsDatasource(delay=0) for name in ('ipfs', 'fallback_ipfs', 'fallback2_ipfs')}
+        ctx = make_ctx(datasources)
+
+        assert await fetch_ipfs_json(ctx, 'ipfs://cid') == {}
+
+
+class IpfsCacheTest(IsolatedAsyncioTestCase):
+    async def test_put_cached(self) -> None:
+        async with tortoise_wrapper('sqlite://:memory:', 'hicdex'), TransactionManager().register():
+            await generate_schema(get_connection(), 'public')
+
+            await put_cached('ipfs://Qm1', {'name': 'a\x00b', 'tags': ['c\x00'], 'attributes\x00': {'d': 1}})
+            assert await get_cached('ipfs://Qm1') == {'name': 'ab', 'tags': ['c'], 'attributes': {'d': 1}}
+            assert await get_cached('ipfs://Qm2') is None
+
+    async def test_prune_cache(self) -> None:
+        async with tortoise_wrapper('sqlite://:memory:', 'hicdex'), TransactionManager().register():
+            await generate_schema(get_connection(), 'public')
+            await prune_cache(make_ctx({}, ipfs_cache_max_bytes=0))
+
+            for i in range(3):
+                await put_cached(f'ipfs://Qm{i}', {'name': str(i)})
+            await prune_cache(make_ctx({}, ipfs_cache_max_bytes=30))
+            assert await models.IpfsCache.all().count() == 2
@@ -0,0 +1,69 @@
+import logging
+from typing import List, Optional
+from unittest import IsolatedAsyncioTestCase
+
+from dipdup.prometheus import Metrics as DipDupMetrics
+from prometheus_client import REGISTRY
+
+from hicdex.metrics import Metrics
+
+LABELS = {'callback': 'on_test', 'contract': 'HEN_objkts'}
+
+
+def _sample(name: str) -> Optional[float]:
+    return REGISTRY.get_sample_value(name, LABELS)
+
+
+class _RecordingHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: List[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+class MetricsTest(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        DipDupMetrics.enabled = True
+
+    async def asyncTearDown(self) -> None:
+        DipDupMetrics.enabled = False
+
+    async def test_measure_callback(self) -> None:
+        queries = _sample('hicdex_callback_queries_total') or 0
+        rows_written = _sample('hicdex_callback_rows_written_total') or 0
+        calls = _sample('hicdex_callback_duration_seconds_count') or 0
+
+        logger = logging.getLogger('tortoise.db_client')
+        with Metrics.measure_callback(**LABELS):
+            logger.debug('%s: %s', 'SELECT * FROM "token" WHERE "id"=?', [1])
+            logger.debug('%s: %s', 'INSERT INTO "holder" ("address") VALUES (?)', ['tz1a'])
+            logger.debug('%s: %s', 'INSERT INTO "token_holder" ("id") VALUES (?)', [[1], [2], [3]])
+        logger.debug('%s: %s', 'DELETE FROM "swap"', [])
+
+        assert _sample('hicdex_callback_queries_total') == queries + 3
+        assert _sample('hicdex_callback_rows_written_total') == rows_written + 4
+        assert _sample('hicdex_callback_duration_seconds_count') == calls + 1
+
+    async def test_ipfs_wait(self) -> None:
+        labels = {**LABELS, 'provider': 'ipfs'}
+        count = REGISTRY.get_sample_value('hicdex_callback_ipfs_wait_seconds_count', labels) or 0
+
+        with Metrics.measure_callback(**LABELS):
+            Metrics.observe_ipfs_wait('ipfs', 0.5)
+
+        assert REGISTRY.get_sample_value('hicdex_callback_ipfs_wait_seconds_count', labels) == count + 1
+
+    async def test_query_log_output_unchanged(self) -> None:
+        logger = logging.getLogger('tortoise.db_client')
+        handler = _RecordingHandler()
+        logging.getLogger('tortoise').addHandler(handler)
+        try:
+            with Metrics.measure_callback(**LABELS):
+                logger.debug('%s: %s', 'SELECT * FROM "token" WHERE "id"=?', [1])
+                logger.warning('slow query')
+        finally:
+            logging.getLogger('tortoise').removeHandler(handler)
+
+        assert [record.getMessage() for record in handler.records] == ['slow query']
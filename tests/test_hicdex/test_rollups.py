@@ -0,0 +1,111 @@
+import os
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import cast
+from unittest import IsolatedAsyncioTestCase, skipIf
+
+from dipdup.transactions import TransactionManager
+from dipdup.utils.database import execute_sql, generate_schema, get_connection, tortoise_wrapper
+
+import hicdex
+import hicdex.models as models
+
+# NOTE: Schema `public` of this database is dropped
+POSTGRES_TEST_URL = os.environ.get('POSTGRES_TEST_URL')
+REFRESH_ROLLUPS_PATH = Path(hicdex.__file__).parent / 'sql' / 'on_synchronized'
+
+CREATOR = 'tz1creator00000000000000000000000000'
+BUYER = 'tz1buyer0000000000000000000000000000'
+FA2 = 'KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton'
+
+
+def _timestamp(day: int) -> datetime:
+    return datetime(2021, 3, day, tzinfo=timezone.utc)
+
+
+async def _swap(opid: int, token_id: int, price: int, status: models.SwapStatus, is_valid: bool = True) -> None:
+    await models.Swap.create(
+        id=opid,
+        opid=opid,
+        creator_id=CREATOR,
+        token_id=token_id,
+        price=price,
+        amount=2,
+        amount_left=2,
+        status=status,
+        royalties=100,
+        fa2_id=FA2,
+        contract_address=FA2,
+        contract_version=1,
+        is_valid=is_valid,
+        ophash='o' * 51,
+        level=opid,
+        timestamp=_timestamp(1),
+    )
+
+
+async def _trade(trade_id: int, swap_id: int, token_id: int, amount: int, day: int) -> None:
+    await models.Trade.create(
+        id=trade_id,
+        swap_id=swap_id,
+        token_id=token_id,
+        seller_id=CREATOR,
+        buyer_id=BUYER,
+        amount=amount,
+        ophash='o' * 51,
+        level=trade_id,
+        timestamp=_timestamp(day),
+    )
+
+
+@skipIf(POSTGRES_TEST_URL is None, 'POSTGRES_TEST_URL is not set')
+class RefreshRollupsTest(IsolatedAsyncioTestCase):
+    async def test_refresh_rollups(self) -> None:
+        async with tortoise_wrapper(cast(str, POSTGRES_TEST_URL), 'hicdex'), TransactionManager().register():
+            conn = get_connection()
+            await conn.execute_script('DROP SCHEMA IF EXISTS public CASCADE; CREATE SCHEMA public')
+            await generate_schema(conn, 'public')
+
+            await models.FA2.create(contract=FA2)
+            await models.Holder.create(address=CREATOR)
+            await models.Holder.create(address=BUYER)
+            # NOTE: Rollups are out of sync with `swap` and `trade`
+            await models.Token.create(id=1, creator_id=CREATOR, floor_price=5)
+            await models.Token.create(id=2, creator_id=CREATOR)
+            await models.TokenStats.create(token_id=2, trade_count=9, volume=900, last_sale_price=100)
+            await models.CreatorStats.create(creator_id=CREATOR, trade_count=1, volume=1, floor_price=5)
+            await models.DailyStats.create(day=date(2021, 3, 1), trade_count=5, volume=5)
+
+            await _swap(1, 1, 100, models.SwapStatus.ACTIVE)
+            await _swap(2, 1, 50, models.SwapStatus.FINISHED)
+            await _swap(3, 2, 70, models.SwapStatus.ACTIVE)
+            await _swap(4, 2, 10, models.SwapStatus.ACTIVE, is_valid=False)
+            await _trade(10, 2, 1, 2, day=1)
+            await _trade(11, 1, 1, 1, day=2)
+
+            await execute_sql(conn, REFRESH_ROLLUPS_PATH)
+
+            tokens = await models.Token.all().order_by('id')
+            assert [token.floor_price for token in tokens] == [100, 70]
+
+            token_stats = await models.TokenStats.all().order_by('token_id')
+            assert [
+                (stats.token_id, stats.trade_count, stats.volume, stats.last_sale_price, stats.last_sale_level)
+                for stats in token_stats
+            ] == [(1, 2, 200, 100, 11), (2, 0, 0, None, None)]
+
+            creator_stats = await models.CreatorStats.get(creator_id=CREATOR)
+            assert (
+                creator_stats.trade_count,
+                creator_stats.volume,
+                creator_stats.last_sale_price,
+                creator_stats.last_sale_timestamp,
+                creator_stats.floor_price,
+            ) == (2, 200, 100, _timestamp(2), 70)
+            assert not await models.CreatorStats.filter(creator_id=BUYER).exists()
+
+            daily_stats = await models.DailyStats.all().order_by('day')
+            assert [(stats.day, stats.trade_count, stats.volume) for stats in daily_stats] == [
+                (date(2021, 3, 1), 1, 100),
+                (date(2021, 3, 2), 1, 100),
+            ]
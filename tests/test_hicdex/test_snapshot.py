@@ -0,0 +1,156 @@
+import gzip
+import os
+import shutil
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from typing import cast
+from unittest import IsolatedAsyncioTestCase, skipIf
+
+from dipdup.context import DipDupContext
+from dipdup.models import Index, IndexType, Schema
+from dipdup.transactions import TransactionManager
+from dipdup.utils.database import generate_schema, get_connection, get_schema_hash, tortoise_wrapper
+
+import hicdex.models as models
+from hicdex.snapshot import parse_copy, read_schema_hash, restore_snapshot
+
+# NOTE: Schema `public` of this database is dropped
+POSTGRES_TEST_URL = os.environ.get('POSTGRES_TEST_URL')
+PG_DUMP = shutil.which('pg_dump')
+
+DUMP = b'''--
+-- PostgreSQL database dump
+--
+
+COPY public.dipdup_index (name, type, status, config_hash, template, template_values, level) FROM stdin;
+hen_mainnet\toperation\tREALTIME\tabc\t\\N\t\\N\t1500000
+\\.
+
+COPY public.dipdup_schema (name, hash, reindex, created_at, updated_at) FROM stdin;
+public\tdeadbeef\t\\N\t2021-03-01 00:00:00+00\t2021-03-01 00:00:00+00
+\\.
+
+SELECT pg_catalog.setval('public.trade_id_seq', 42, true);
+'''
+
+
+class SnapshotTest(IsolatedAsyncioTestCase):
+    async def test_parse_copy(self) -> None:
+        assert parse_copy(b'COPY public.token_holder (id, holder_id, token_id, quantity) FROM stdin;\n') == (
+            'token_holder',
+            ['id', 'holder_id', 'token_id', 'quantity'],
+        )
+        assert parse_copy(b'COPY "public"."token" ("id", "title") FROM stdin;\n') == ('token', ['id', 'title'])
+        assert parse_copy(b'CREATE TABLE public.token (\n') is None
+
+    async def test_read_schema_hash(self) -> None:
+        with TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'dipdup-latest.sql.gz'
+            with gzip.open(path, 'wb') as file:
+                file.write(DUMP)
+
+            assert read_schema_hash(path, 'public') == 'deadbeef'
+            assert read_schema_hash(path, 'hicdex') is None
+
+
+async def _recreate_schema() -> None:
+    conn = get_connection()
+    await conn.execute_script('DROP SCHEMA IF EXISTS public CASCADE; CREATE SCHEMA public')
+    await generate_schema(conn, 'public')
+
+
+def _ctx() -> DipDupContext:
+    database = SimpleNamespace(kind='postgres', immune_tables=['ipfs_cache'])
+    return cast(DipDupContext, SimpleNamespace(config=SimpleNamespace(schema_name='public', database=database)))
+
+
+async def _create_swap(timestamp: datetime) -> int:
+    swap = await models.Swap.create(
+        id=0,
+        opid=100,
+        creator_id='tz1a',
+        token_id=1,
+        price=1,
+        amount=1,
+        amount_left=0,
+        status=models.SwapStatus.FINISHED,
+        royalties=100,
+        fa2_id='KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton',
+        contract_address='KT1HbQepzV1nVGg8QVznG7z4RcHseD5kwqBn',
+        contract_version=2,
+        ophash='o' * 51,
+        level=1,
+        timestamp=timestamp,
+    )
+    return swap.opid
+
+
+@skipIf(POSTGRES_TEST_URL is None or PG_DUMP is None, 'POSTGRES_TEST_URL is not set or pg_dump is missing')
+class RestoreSnapshotTest(IsolatedAsyncioTestCase):
+    async def test_restore_pg_dump(self) -> None:
+        timestamp = datetime(2021, 3, 1, tzinfo=timezone.utc)
+        async with tortoise_wrapper(cast(str, POSTGRES_TEST_URL), 'hicdex'), TransactionManager().register():
+            await _recreate_schema()
+            await Schema.create(name='public', hash=get_schema_hash(get_connection()))
+            await Index.create(name='hen_mainnet', type=IndexType.operation, config_hash='abc', level=1500000)
+            await models.FA2.create(contract='KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton')
+            await models.Holder.create(address='tz1a', name='tab\tand\nnewline')
+            await models.Token.create(id=1, creator_id='tz1a', metadata='ipfs://Qm1')
+            await models.Trade.create(
+                token_id=1,
+                swap_id=await _create_swap(timestamp),
+                seller_id='tz1a',
+                buyer_id='tz1a',
+                amount=1,
+                ophash='o' * 51,
+                level=1,
+                timestamp=timestamp,
+            )
+            await models.IpfsCache.create(cid='ipfs://Qm1', data={}, checksum='a', size=2, accessed_at=timestamp)
+
+            with TemporaryDirectory() as tmp:
+                path = Path(tmp) / 'dipdup-latest.sql.gz'
+                # NOTE: Same options as `backup` service in docker-compose.yml
+                args = ['-Z6', '--clean', '--schema=public', '--blobs', '-f', str(path)]
+                subprocess.run([cast(str, PG_DUMP), f'--dbname={POSTGRES_TEST_URL}', *args], check=True)
+
+                await _recreate_schema()
+                await models.IpfsCache.create(cid='ipfs://Qm2', data={}, checksum='b', size=2, accessed_at=timestamp)
+                await restore_snapshot(_ctx(), path)
+
+            assert (await Index.get(name='hen_mainnet')).level == 1500000
+            assert (await models.Holder.get(address='tz1a')).name == 'tab\tand\nnewline'
+            assert (await models.Token.get(id=1)).metadata == 'ipfs://Qm1'
+            assert await models.Swap.all().count() == 1
+            trade = await models.Trade.get(token_id=1)
+            assert trade.timestamp == timestamp
+            # NOTE: Sequence values are restored too
+            new_trade = await models.Trade.create(
+                token_id=1,
+                swap_id=trade.swap_id,
+                seller_id='tz1a',
+                buyer_id='tz1a',
+                amount=1,
+                ophash='o' * 51,
+                level=2,
+                timestamp=timestamp,
+            )
+            assert new_trade.id == trade.id + 1
+            assert await models.IpfsCache.all().values_list('cid', flat=True) == ['ipfs://Qm2']
+            # NOTE: Created by DipDup once `on_reindex` is done
+            assert await Schema.all().count() == 0
+
+    async def test_incompatible_snapshot(self) -> None:
+        async with tortoise_wrapper(cast(str, POSTGRES_TEST_URL), 'hicdex'), TransactionManager().register():
+            await _recreate_schema()
+            with TemporaryDirectory() as tmp:
+                path = Path(tmp) / 'dipdup-latest.sql.gz'
+                with gzip.open(path, 'wb') as file:
+                    file.write(DUMP)
+
+                with self.assertLogs('hicdex.snapshot', 'WARNING'):
+                    await restore_snapshot(_ctx(), path)
+            assert await Index.all().count() == 0
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+from typing import Any, Dict, cast
+from unittest import IsolatedAsyncioTestCase
+
+from dipdup.context import DipDupContext
+from dipdup.exceptions import ConfigurationError
+from dipdup.utils.database import generate_schema, get_connection, tortoise_wrapper
+
+from hicdex.sqlite import DEFERRED_INDEXES, LOOKUP_INDEXES, apply_pragmas, create_indexes
+
+
+def _context(custom: Dict[str, Any]) -> DipDupContext:
+    return cast(DipDupContext, SimpleNamespace(config=SimpleNamespace(custom=custom)))
+
+
+class SqliteTest(IsolatedAsyncioTestCase):
+    async def test_apply_pragmas(self) -> None:
+        async with tortoise_wrapper('sqlite://:memory:', 'hicdex'):
+            conn = get_connection()
+            await apply_pragmas(_context({'sqlite_pragmas': {'cache_size': -1024, 'temp_store': 'memory'}}))
+            assert await conn.execute_query_dict('PRAGMA cache_size') == [{'cache_size': -1024}]
+            assert await conn.execute_query_dict('PRAGMA temp_store') == [{'temp_store': 2}]
+
+            await apply_pragmas(_context({}))
+            with self.assertRaises(ConfigurationError):
+                await apply_pragmas(_context({'sqlite_pragmas': {'cache_size': '0; DROP TABLE token'}}))
+
+    async def test_create_indexes(self) -> None:
+        async with tortoise_wrapper('sqlite://:memory:', 'hicdex'):
+            conn = get_connection()
+            await generate_schema(conn, 'public')
+            await create_indexes(LOOKUP_INDEXES)
+            _, rows = await conn.execute_query("SELECT name FROM sqlite_master WHERE type = 'index'")
+            assert 'swap_active_token_price_idx' in {row['name'] for row in rows}
+            await create_indexes((*LOOKUP_INDEXES, *DEFERRED_INDEXES))
+
+            _, rows = await conn.execute_query("SELECT name FROM sqlite_master WHERE type = 'index'")
+            names = {row['name'] for row in rows}
+            assert {'swap_contract_id_idx', 'token_level_idx', 'holder_missing_metadata_idx'} <= names
@@ -0,0 +1,49 @@
+from datetime import datetime
+from unittest import IsolatedAsyncioTestCase
+
+from dipdup.datasources.tzkt.models import deserialize_storage
+from dipdup.models import OperationData
+
+from hicdex.types.hen_objkts.storage import HenObjktsStorage
+from hicdex.types.hen_swap_v2.storage import HenSwapV2Storage
+
+
+def _operation_data(storage: dict, diffs: tuple = ()) -> OperationData:
+    return OperationData(
+        type='transaction',
+        id=1,
+        level=1,
+        timestamp=datetime.now(),
+        hash='',
+        counter=1,
+        sender_address=None,
+        target_address=None,
+        initiator_address=None,
+        amount=None,
+        status='applied',
+        has_internals=None,
+        storage=storage,
+        diffs=diffs,
+    )
+
+
+class StorageTest(IsolatedAsyncioTestCase):
+    async def test_unused_fields_are_skipped(self) -> None:
+        swap_diff = {
+            'bigmap': 523,
+            'path': 'swaps',
+            'action': 'add_key',
+            'content': {'key': '1', 'value': {'creator': 'tz1a'}},
+        }
+        data = _operation_data(
+            {'counter': '2', 'fee': '25', 'manager': 'tz1a', 'metadata': 521, 'objkt': 'KT1a', 'swaps': 523},
+            (swap_diff,),
+        )
+
+        storage = deserialize_storage(data, HenSwapV2Storage)
+        assert storage.counter == '2'
+        assert not hasattr(storage, 'swaps')
+
+    async def test_empty_storage(self) -> None:
+        data = _operation_data({'administrator': 'tz1a', 'all_tokens': '1', 'ledger': 511, 'paused': False})
+        assert deserialize_storage(data, HenObjktsStorage) == HenObjktsStorage()
@@ -0,0 +1,87 @@
+import asyncio
+from typing import AsyncIterator, Dict, List
+from unittest import IsolatedAsyncioTestCase
+
+import dipdup.models as dipdup_models
+from dipdup.transactions import TransactionManager
+from dipdup.utils.database import generate_schema, get_connection, tortoise_wrapper
+
+import hicdex.models as models
+from hicdex.utils import gather_bounded, insert_unversioned, is_enabled, update_unversioned
+
+
+async def _numbers(count: int) -> AsyncIterator[int]:
+    for i in range(count):
+        yield i
+
+
+class GatherBoundedTest(IsolatedAsyncioTestCase):
+    async def test_concurrency_limit(self) -> None:
+        in_flight, max_in_flight = 0, 0
+        processed: List[int] = []
+
+        async def _callback(item: int) -> None:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            processed.append(item)
+            in_flight -= 1
+
+        await gather_bounded(_numbers(20), _callback, concurrency=4)
+
+        assert sorted(processed) == list(range(20))
+        assert max_in_flight == 4
+
+    async def test_failures_are_isolated(self) -> None:
+        processed: List[int] = []
+
+        async def _callback(item: int) -> None:
+            if item % 2:
+                raise ValueError(item)
+            processed.append(item)
+
+        await gather_bounded(_numbers(6), _callback, concurrency=2)
+
+        assert sorted(processed) == [0, 2, 4]
+
+
+class UnversionedWritesTest(IsolatedAsyncioTestCase):
+    async def test_versioned_transaction(self) -> None:
+        async with tortoise_wrapper('sqlite://:memory:', 'hicdex'):
+            await generate_schema(get_connection(), 'public')
+            transactions = TransactionManager(depth=2)
+            async with transactions.register():
+                token = await models.Token.create(id=1)
+                await insert_unversioned(models.TagModel, [models.TagModel(tag='a')])
+
+                # NOTE: A job writes while an index has a level within rollback depth open
+                async with transactions.in_transaction(level=10, sync_level=10, index='test'):
+                    await insert_unversioned(models.TagModel, [models.TagModel(tag=tag) for tag in ('a', 'b')])
+                    tag_ids: Dict[str, int] = {tag.tag: tag.id for tag in await models.TagModel.all()}
+                    token_tags = [models.TokenTag(token_id=1, tag_id=tag_id) for tag_id in tag_ids.values()]
+                    await insert_unversioned(models.TokenTag, token_tags)
+                    await insert_unversioned(models.TokenTag, token_tags)
+                    token.title, token.extra = 'title', {'a': 1}
+                    await update_unversioned(token, ('title', 'extra'))
+
+                assert await models.TagModel.all().count() == 2
+                assert await models.TokenTag.all().count() == 2
+                token = await models.Token.get(id=1)
+                assert (token.title, token.extra) == ('title', {'a': 1})
+                assert await dipdup_models.ModelUpdate.filter(level=10).count() == 0
+
+
+class IsEnabledTest(IsolatedAsyncioTestCase):
+    async def test_is_enabled(self) -> None:
+        assert is_enabled(True)
+        assert is_enabled(1)
+        assert is_enabled('1')
+        assert is_enabled(' True ')
+        assert is_enabled('yes')
+        assert not is_enabled(None)
+        assert not is_enabled(0)
+        assert not is_enabled('')
+        assert not is_enabled('0')
+        assert not is_enabled('false')
+        assert not is_enabled('off')